@@ -0,0 +1,36 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import synthetic
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import storage
+
+
+# measures how many rows/sec storage.save writes for a full backfill of synthetic codes
+def run(codes, years):
+    data = {}
+    for code in synthetic.make_codes(codes):
+        df = synthetic.make_history(code, years)
+        df['Date'] = df['Date'].dt.strftime(storage.DATE_FORMAT)
+        data[code] = df
+    rows = sum(len(df) for df in data.values())
+    with tempfile.TemporaryDirectory() as directory:
+        db_file_path = os.path.join(directory, 'database.sqlite')
+        started = time.perf_counter()
+        storage.save(data, db_file_path)
+        elapsed = time.perf_counter() - started
+        size = os.path.getsize(db_file_path)
+    print(f"{rows} rows for {codes} codes x {years} years in {elapsed:.2f}s "
+          f"({rows / elapsed:.0f} rows/s), database {size / 2 ** 20:.1f}MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the bulk sqlite write path of the scraper")
+    parser.add_argument('--codes', type=int, default=110)
+    parser.add_argument('--years', type=int, default=10)
+    args = parser.parse_args()
+    run(args.codes, args.years)
@@ -0,0 +1,66 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from fake_mse import FakeMse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import http_client
+import main
+import storage
+import table_parser
+
+
+# runs the whole main() flow against a local fake mse.mk and returns the measured numbers
+def run(codes, years, latency, workers, rate):
+    fake = FakeMse(codes, years, latency).start()
+    table_parser.stats = table_parser.ParseStats()
+    storage.stats = storage.WriteStats()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, 'data'))
+        os.chdir(directory)
+        started = time.perf_counter()
+        try:
+            main.main(['--base-url', fake.url, '--workers', str(workers), '--rate', str(rate), '--no-cache', '--fresh'])
+        finally:
+            elapsed = time.perf_counter() - started
+            os.chdir(cwd)
+            fake.stop()
+
+    requests = http_client.get_client().stats.requests
+    parse = table_parser.stats
+    write = storage.stats
+    return {
+        'codes': codes,
+        'years': years,
+        'latency': latency,
+        'workers': workers,
+        'seconds': round(elapsed, 3),
+        'requests': requests,
+        'requests_per_second': round(requests / elapsed, 2),
+        'parse_seconds': round(parse.seconds, 3),
+        'parse_ms_per_response': round(parse.seconds / parse.responses * 1000, 3) if parse.responses else None,
+        'rows': write.rows,
+        'write_rows_per_second': round(write.rows / write.seconds) if write.seconds else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the scraper end to end against a local fake mse.mk")
+    parser.add_argument('--codes', type=int, default=110)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds the fake server waits per response")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=0, help="max requests per second, 0 for no limit")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = run(args.codes, args.years, args.latency, args.workers, args.rate)
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,115 @@
+import argparse
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import synthetic
+
+# codes the real select lists but the scraper filters out
+EXTRA_CODES = ["TTK", "CKB", "ALK2024"]
+
+
+# renders a resultsTable page the way mse.mk does: M/D/YYYY dates and 1,234.56 numbers
+def render_history(df):
+    header = ''.join(f"<th>{column}</th>" for column in df.columns)
+    rows = []
+    for row in df.itertuples(index=False):
+        day = row[0]
+        cells = [f"{day.month}/{day.day}/{day.year}"] + [f"{value:,.2f}" for value in row[1:]]
+        rows.append('<tr>' + ''.join(f"<td>{cell}</td>" for cell in cells) + '</tr>')
+    return (f"<html><body><table id=\"resultsTable\" class=\"table\"><thead><tr>{header}</tr></thead>"
+            f"<tbody>{''.join(rows)}</tbody></table></body></html>")
+
+
+def render_codes(codes):
+    options = ''.join(f"<option value=\"{code}\">{code}</option>" for code in codes)
+    return f"<html><body><select id=\"Code\" name=\"Code\">{options}</select></body></html>"
+
+
+# local stand-in for the mse.mk symbolhistory pages with a synthetic history for every code
+class FakeMse:
+    def __init__(self, codes=110, years=10, latency=0.0, port=0):
+        self.codes = synthetic.make_codes(codes)
+        self.years = years
+        self.latency = latency
+        self.histories = {}
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self.handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}/en/stats/symbolhistory"
+
+    def history(self, code):
+        with self.lock:
+            if code not in self.histories:
+                self.histories[code] = synthetic.make_history(code, self.years)
+            return self.histories[code]
+
+    def handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def reply(self, body, status=200):
+                data = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                fake.count()
+                self.reply(render_codes(fake.codes + EXTRA_CODES))
+
+            def do_POST(self):
+                fake.count()
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+                form = {key: values[0] for key, values in parse_qs(body).items()}
+                code = self.path.rstrip('/').rsplit('/', 1)[-1]
+                if code not in fake.codes:
+                    self.reply("<html><body>No data</body></html>")
+                    return
+                date_from = datetime.strptime(form['FromDate'], "%m/%d/%Y")
+                date_to = datetime.strptime(form['ToDate'], "%m/%d/%Y")
+                df = fake.history(code)
+                self.reply(render_history(df[(df['Date'] >= date_from) & (df['Date'] <= date_to)]))
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def count(self):
+        with self.lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serves synthetic mse.mk symbolhistory pages")
+    parser.add_argument('--codes', type=int, default=110)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument('--port', type=int, default=8001)
+    args = parser.parse_args()
+    fake = FakeMse(args.codes, args.years, args.latency, args.port)
+    print(f"Serving {len(fake.codes)} codes at {fake.url}")
+    fake.server.serve_forever()
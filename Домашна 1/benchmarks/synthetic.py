@@ -0,0 +1,32 @@
+import os
+import sys
+import zlib
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import table_parser
+
+
+# returns codes like AAAA, AAAB, ... that look like mse.mk issuer codes
+def make_codes(count):
+    letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    return [''.join(letters[(i // 26 ** p) % 26] for p in (3, 2, 1, 0)) for i in range(count)]
+
+
+# returns a random walk history for one code shaped like a parsed resultsTable, newest day first
+def make_history(code, years=10, end=None):
+    rng = np.random.default_rng(zlib.crc32(code.encode()))
+    end = pd.Timestamp(end or datetime.now()).normalize()
+    dates = pd.bdate_range(end - pd.DateOffset(years=years), end)[::-1]
+    count = len(dates)
+    price = np.round(1000 * np.exp(np.cumsum(rng.normal(0, 0.01, count))), 2)
+    spread = np.abs(rng.normal(0, 0.005, count)) * price
+    volume = rng.integers(0, 500, count).astype(np.float64)
+    turnover = np.round(volume * price, 0)
+    change = np.round(np.append(-np.diff(price) / price[1:] * 100, 0), 2)
+    columns = [dates, price, np.round(price + spread, 2), np.round(price - spread, 2), price, change,
+               volume, turnover, turnover]
+    return pd.DataFrame(dict(zip(table_parser.EXPECTED_HEADERS, columns)))
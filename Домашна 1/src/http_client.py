@@ -0,0 +1,194 @@
+import os
+import random
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests import RequestException
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+# spaces out requests so that every host gets at most `rate` requests per second (None means no limit)
+class HostRateLimiter:
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_slot = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url):
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+# number of retries shared by every request of a run, once it is spent failed requests are not retried anymore
+class RetryBudget:
+    def __init__(self, total):
+        self.remaining = total
+        self.lock = threading.Lock()
+
+    def take(self):
+        with self.lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+# stores raw response bodies on disk, one file per key, e.g. data/http_cache/ADIN/01_01_2024_01_01_2025.html
+class ResponseCache:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, key):
+        parts = [re.sub(r'[^\w.-]', '_', str(part)) for part in key]
+        if len(parts) > 1:
+            parts = [parts[0], '_'.join(parts[1:])]
+        return os.path.join(self.directory, *parts) + '.html'
+
+    # returns the cached body or None when it is missing or older than ttl seconds (ttl None never expires)
+    def get(self, key, ttl=None):
+        path = self.path(key)
+        try:
+            if ttl is not None and time.time() - os.path.getmtime(path) >= ttl:
+                return None
+            with open(path, encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, key, text):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+# the part of requests.Response the scraper uses, for bodies served from the cache
+class CachedResponse:
+    status_code = 200
+
+    def __init__(self, url, text):
+        self.url = url
+        self.text = text
+
+
+# thread safe counters used to report how fast the scraper talks to the server
+class FetchStats:
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def add(self, requests=0, retries=0, failures=0, cache_hits=0, cache_misses=0):
+        with self.lock:
+            self.requests += requests
+            self.retries += retries
+            self.failures += failures
+            self.cache_hits += cache_hits
+            self.cache_misses += cache_misses
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def report(self):
+        elapsed = self.elapsed()
+        rate = self.requests / elapsed if elapsed > 0 else 0.0
+        return (f"{self.requests} requests in {elapsed:.2f}s ({rate:.2f} req/s), "
+                f"{self.retries} retries, {self.failures} failed, "
+                f"cache {self.cache_hits} hits / {self.cache_misses} misses")
+
+
+# sends requests over a pooled keep-alive session with a per host rate limit and retries failed ones with
+# exponential backoff. Requests given a cache_key are answered from the on-disk cache while it is fresh,
+# in replay mode only the cache is used and nothing is sent to the server
+class HttpClient:
+    def __init__(self, rate=None, retries=3, backoff=0.5, retry_budget=100, timeout=30,
+                 pool_size=10, cache_dir=None, replay=False):
+        self.limiter = HostRateLimiter(rate)
+        self.retries = retries
+        self.backoff = backoff
+        self.budget = RetryBudget(retry_budget)
+        self.timeout = timeout
+        self.stats = FetchStats()
+        self.cache = ResponseCache(cache_dir) if cache_dir else None
+        self.replay = replay
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    # returns the response or None when every attempt failed, ttl is the max age in seconds of a cached body
+    def request(self, method, url, cache_key=None, ttl=None, **kwargs):
+        if cache_key is not None and self.cache is not None:
+            text = self.cache.get(cache_key, None if self.replay else ttl)
+            if text is not None:
+                self.stats.add(cache_hits=1)
+                return CachedResponse(url, text)
+            self.stats.add(cache_misses=1)
+        if self.replay:
+            return None
+
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            self.limiter.acquire(url)
+            self.stats.add(requests=1)
+            error = None
+            try:
+                response = self.session.request(method, url, **kwargs)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    if cache_key is not None and self.cache is not None and response.status_code == 200:
+                        self.cache.put(cache_key, response.text)
+                    return response
+                error = f"status {response.status_code}"
+            except RequestException as e:
+                error = e
+            if attempt >= self.retries or not self.budget.take():
+                print(f"An error occurred: {error}")
+                self.stats.add(failures=1)
+                return None
+            self.stats.add(retries=1)
+            time.sleep(self.backoff * 2 ** attempt * (1 + random.random()))
+            attempt += 1
+
+    def close(self):
+        self.session.close()
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+
+_client = HttpClient()
+
+
+# replaces the client used by the scraper functions
+def configure(**kwargs):
+    global _client
+    _client.close()
+    _client = HttpClient(**kwargs)
+    return _client
+
+
+def get_client():
+    return _client
@@ -1,19 +1,26 @@
-import requests
-from requests import RequestException
 from bs4 import BeautifulSoup
-import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime
+import argparse
+import functools
 import os
 import re
-from tqdm import tqdm
-import sqlite3
-
-
-# gets the code of all valid publishers and returns them as a list of strings
-def get_codes():
-    url = "https://www.mse.mk/en/stats/symbolhistory/ADIN"
-    response = requests.get(url)
-    if response.status_code != 200:
+import time
+import http_client
+import pipeline
+import planner
+import snapshot
+import storage
+import table_parser
+
+BASE_URL = "https://www.mse.mk/en/stats/symbolhistory"
+CODES_CACHE_TTL = 24 * 60 * 60
+
+
+# gets the code of all valid publishers and returns them as a list of strings, base_url is the symbolhistory url
+def get_codes(base_url=BASE_URL):
+    url = f"{base_url}/ADIN"
+    response = http_client.get_client().get(url, cache_key=('codes',), ttl=CODES_CACHE_TTL)
+    if response is None or response.status_code != 200:
         print("Bad response code")
         return None
     soup = BeautifulSoup(response.text, "html.parser")
@@ -36,204 +43,124 @@ def get_codes():
     return filtered_codes
 
 
-# checks the db and retrives the latest date for each publisher and returns a map where key is the code and value is latest date
-def get_latest_date(codes, db_file_path):
-    result = {}
-    current_date = datetime.now()
-
-    try:
-        conn = sqlite3.connect(db_file_path)
-        cursor = conn.cursor()
-
-        for code in codes:
-            result[code] = None
-
-            try:
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (code,))
-                table_exists = cursor.fetchone()
-
-                if not table_exists:
-                    cursor.execute(f"CREATE TABLE IF NOT EXISTS {code} (Date TEXT)")
-                    conn.commit()
-                    result[code] = None
-                    continue
-
-                cursor.execute(f"SELECT Date FROM {code}")
-                dates = [row[0] for row in cursor.fetchall()]
-                if len(dates) == 0:
-                    result[code] = None
-                    continue
-
-                date_objects = [datetime.strptime(date_str, "%d.%m.%Y") for date_str in dates]
-                most_recent_date = max((date for date in date_objects if date <= current_date), default=None)
-                result[code] = most_recent_date.strftime("%d.%m.%Y") if most_recent_date else None
-
-            except sqlite3.Error:
-                result[code] = None
-
-    except sqlite3.OperationalError as e:
-        print(f"Database error: {e}")
-    finally:
-        if 'conn' in locals():
-            conn.close()
-
-    return result
-
-
-# handles data scraping for that code from date_from to date_to
-def get_from_to(code, date_from, date_to):
-    url = f"https://www.mse.mk/en/stats/symbolhistory/{code}"
+# downloads the symbolhistory page of that code from date_from to date_to and returns its html
+def fetch_window(code, date_from, date_to, base_url=BASE_URL):
+    url = f"{base_url}/{code}"
 
     payload = f"FromDate={date_from}&ToDate={date_to}&Code={code}"
     headers = {"Content-Type": "application/x-www-form-urlencoded"}
-    response = None
-    try:
-        response = requests.post(url, data=payload, headers=headers)
-        response.raise_for_status()
-    except RequestException as e:
-        print(f"An error occurred: {e}")
+    # windows that ended before today are closed and never change, the current one is always fetched again
+    closed = datetime.strptime(date_to, "%m/%d/%Y").date() < datetime.now().date()
+    response = http_client.get_client().post(url, data=payload, headers=headers,
+                                             cache_key=(code, date_from, date_to), ttl=None if closed else 0)
     if response is None:
         return None
     if response.status_code != 200:
+        print(f"An error occurred: status {response.status_code} for {code}")
         return None
-    soup = BeautifulSoup(response.text, "html.parser")
+    return response.text
 
-    table = soup.find("table", id="resultsTable")
 
-    if table is None:
+# parses a symbolhistory page into a Data Frame ready to be stored, days without turnover are dropped
+def parse_window(code, text):
+    try:
+        df = table_parser.parse_results_table(text)
+    except ValueError as e:
+        print(f"An error occurred: {e} for {code}")
         return None
+    if df is None:
+        return None
+    df = df[df["Total turnover in denars"] != 0].copy()
+    df['Date'] = df['Date'].dt.strftime(storage.DATE_FORMAT)
+    return df
 
-    rows_data = []
-    header_row = table.find("tr")
-    headers = [th.text.strip() for th in header_row.find_all("th")]
-
-    for row in table.find_all("tr")[1:]:
-        row_data = [td.text.strip() for td in row.find_all("td")]
-        rows_data.append(row_data)
-
-    return pd.DataFrame(rows_data, columns=headers)
-
-
-# gets a date and a number representing years and returns a date plus the number of years passed to it
-def adjust_year(date, years):
-    date_format = "%m/%d/%Y"
-    date_obj = datetime.strptime(date, date_format)
-    adjusted_date = date_obj.replace(year=date_obj.year + years)
-    return adjusted_date.strftime(date_format)
-
-
-# returns a list of DataFrame objects from the date passed in(+1 day) up to the current date
-def get_recent(code, date):
-    date_obj = datetime.strptime(date, "%d.%m.%Y")
-    formatted_date = date_obj.strftime("%m/%d/%Y")
-    date_from = (datetime.strptime(formatted_date, "%m/%d/%Y") + timedelta(days=1)).strftime("%m/%d/%Y")
-    data_frame_list = []
-    do_loop = True
-    while do_loop:
-        date_to = adjust_year(date_from, 1)
-        if datetime.strptime(date_to, "%m/%d/%Y") > datetime.now():
-            date_to = datetime.now().strftime("%m/%d/%Y")
-            do_loop = False
-
-        df = get_from_to(code, date_from, date_to)
-        if df is not None:
-            data_frame_list.append(df)
-        date_from = date_to
-
-    return data_frame_list
-
-
-# gets last 10 years of data for that code and returns a list of Data Frames
-def get_last_ten_years(code):
-    data_frame_list = []
-    date_to = datetime.now().strftime("%m/%d/%Y")
-    for i in range(10):
-        date_from = adjust_year(date_to, -1)
-
-        df = get_from_to(code, date_from, date_to)
-        if df is None:
-            continue
-
-        data_frame_list.append(df)
-        date_to = date_from
-
-    return data_frame_list
-
-
-# scrapes data for each publisher and returns a map where key is code and value is a Data Frame
-def scrape_data(last_date_map):
-    data = {}
-    for code, date in tqdm(last_date_map.items(), ncols=100, colour='green'):
-        if date is None:
-            df_list = get_last_ten_years(code)
-        else:
-            df_list = get_recent(code, date)
-        if len(df_list) == 0:
-            data[code] = None
-            continue
-        result = df_list[0]
-        for i in range(1, len(df_list)):
-            result = pd.concat([result, df_list[i]], ignore_index=True)
-        result = result[result["Total turnover in denars"] != "0"]
-
-        date = pd.to_datetime(result['Date'])
-        result.loc[:, 'Date'] = date.dt.strftime('%d.%m.%Y')
-
-        result = result.replace('', '0')
-        data[code] = result
-    return data
-
-
-# saves data to database with that path
-def save(data, db_file_path):
-    conn = sqlite3.connect(db_file_path)
-    cursor = conn.cursor()
-
-    for code, df in data.items():
-        if df is None:
-            continue
-        field_names = []
-        for col in df.columns:
-            field_names.append(col.replace(' ', '_').replace(',', '').replace('.', '').replace('%', ''))
-
-        column_definitions = []
-        for col in field_names:
-            if col == 'Date':
-                column_definitions.append(f"{col} TEXT")
-                continue
-            column_definitions.append(f"{col} REAL")
-
-        create_table_sql = f"CREATE TABLE IF NOT EXISTS {code} ({', '.join(column_definitions)});"
-        cursor.execute(create_table_sql)
-
-        for index, row in df.iterrows():
-            values = [row['Date']]
-
-            values[0] = f"'{values[0]}'"
 
-            for col in df.columns:
-                if col != 'Date':
-                    cleaned_value = str(row[col]).replace(',', '')
-                    numeric_value = pd.to_numeric(cleaned_value, errors='coerce')
-                    values.append(numeric_value)
-
-            insert_sql = f"INSERT INTO {code} ({', '.join(field_names)}) VALUES ({', '.join(map(str, values))})"
-            cursor.execute(insert_sql)
-
-    conn.commit()
-    conn.close()
-
-
-def main():
+# handles data scraping for that code from date_from to date_to
+def get_from_to(code, date_from, date_to, base_url=BASE_URL):
+    text = fetch_window(code, date_from, date_to, base_url)
+    if text is None:
+        return None
+    return parse_window(code, text)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scrapes the issuer history from mse.mk into an sqlite database")
+    parser.add_argument('--base-url', default=BASE_URL, help="symbolhistory url, e.g. of a local fake server")
+    parser.add_argument('--workers', type=int, default=8, help="number of concurrent requests (1 scrapes sequentially)")
+    parser.add_argument('--rate', type=float, default=10.0, help="max requests per second to one host, 0 for no limit")
+    parser.add_argument('--retries', type=int, default=3, help="retries for a single failed request")
+    parser.add_argument('--retry-budget', type=int, default=100, help="max retries for the whole run")
+    parser.add_argument('--cache-dir', default=os.path.join('data', 'http_cache'), help="on-disk response cache")
+    parser.add_argument('--no-cache', action='store_true', help="do not read or write the response cache")
+    parser.add_argument('--replay', action='store_true', help="serve responses only from the cache, no network")
+    parser.add_argument('--fresh', action='store_true', help="start a new run instead of resuming an unfinished one")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    base_url = args.base_url.rstrip('/')
     output_dir = os.path.join(os.getcwd(), 'data')
     file_name = 'database.sqlite'
     db_file_path = os.path.join(output_dir, file_name)
 
-    codes = get_codes()
-    latest_date_map = get_latest_date(codes, db_file_path)
-    data = scrape_data(latest_date_map)
-    save(data, db_file_path)
+    started = time.perf_counter()
+    client = http_client.configure(rate=args.rate or None, retries=args.retries, retry_budget=args.retry_budget,
+                                   pool_size=args.workers, cache_dir=None if args.no_cache else args.cache_dir,
+                                   replay=args.replay)
+    storage.migrate(db_file_path)
+    codes = get_codes(base_url)
+    if codes is None:
+        return
+
+    journal = planner.Journal(os.path.join(output_dir, 'scrape_journal.json'))
+    done = journal.start_run(fresh=args.fresh)
+    # codes whose windows a crashed run wrote without rebuilding their summary and bars
+    unfinished = journal.unfinished()
+    if done or unfinished:
+        print(f"Resuming run {journal.state['run']['id']}, {len(done)} codes already committed")
+    plan = planner.plan(codes, db_file_path, journal, skip=done)
+    print(f"Planned {sum(len(windows) for windows in plan.values())} requests for {len(plan)} codes")
+
+    conn = storage.connect_for_load(db_file_path)
+    layout = storage.get_layout(conn)
+
+    # every window is committed as soon as it is parsed and a code is journaled once all its windows are in,
+    # so a crash loses at most the windows still in flight
+    def store(code, df):
+        journal.code_started(code)
+        return storage.write_frame(conn, code, df, layout)
+
+    # the summary and bars of a code are rebuilt once, for the periods of the windows that were fetched,
+    # before it is journaled. A code that a crashed run left unfinished is rebuilt whole
+    def code_done(code, windows):
+        if code in unfinished:
+            storage.refresh_derived(conn, code)
+        elif windows:
+            days = [datetime.strptime(day, planner.WINDOW_FORMAT).strftime(storage.DATE_FORMAT)
+                    for window in windows for day in window]
+            storage.refresh_derived(conn, code, min(days), max(days))
+        journal.code_done(code, windows)
+
+    fetch = functools.partial(fetch_window, base_url=base_url)
+    stream = pipeline.Pipeline(fetch, parse_window, store, code_done, workers=args.workers)
+    try:
+        stream.run(plan)
+    finally:
+        storage.finish_load(conn)
+    journal.finish()
+    storage.bump_data_version(db_file_path)
+
+    exported = time.perf_counter()
+    manifest = snapshot.export(db_file_path, os.path.join(output_dir, 'snapshot'))
+    print(f"Snapshot: {len(manifest['codes'])} codes in {time.perf_counter() - exported:.2f}s")
+    print(f"Scraping: {client.stats.report()}")
+    print(f"Parsing: {table_parser.stats.report()}")
+    print(f"Writing: {storage.stats.report()}")
+    for line in stream.report():
+        print(line)
     print(f"Data saved at:{db_file_path}")
+    print(f"Total time: {time.perf_counter() - started:.2f}s")
 
 
 if __name__ == "__main__":
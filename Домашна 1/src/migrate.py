@@ -0,0 +1,29 @@
+import argparse
+import os
+import sqlite3
+
+import storage
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upgrades a scraper database to the current schema version")
+    parser.add_argument('db_file_path', nargs='?', default=os.path.join('data', 'database.sqlite'))
+    parser.add_argument('--layout', choices=[storage.LAYOUT_TABLES, storage.LAYOUT_LONG], default=storage.LAYOUT_TABLES,
+                        help="'long' moves every code into one prices table keyed by (Code, Date)")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db_file_path)
+    before = conn.execute("PRAGMA user_version").fetchone()[0]
+    conn.close()
+    after = storage.migrate(args.db_file_path)
+    print(f"{args.db_file_path}: schema version {before} -> {after}")
+    if after != before:
+        storage.bump_data_version(args.db_file_path)
+    if args.layout == storage.LAYOUT_LONG:
+        storage.migrate_to_long(args.db_file_path)
+        storage.bump_data_version(args.db_file_path)
+        print(f"{args.db_file_path}: moved to the {storage.LAYOUT_LONG} layout")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import queue
+import threading
+import time
+
+from tqdm import tqdm
+
+DONE = object()
+
+
+# thread safe counters of one pipeline stage, busy is the time spent inside the stage function
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.rows = 0
+        self.busy = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, seconds, rows=0):
+        with self.lock:
+            self.items += 1
+            self.rows += rows
+            self.busy += seconds
+
+    def report(self, elapsed):
+        rate = self.items / elapsed if elapsed > 0 else 0.0
+        row_rate = self.rows / elapsed if elapsed > 0 else 0.0
+        return (f"{self.name}: {self.items} windows ({rate:.2f}/s), {self.rows} rows ({row_rate:.0f}/s), "
+                f"busy {self.busy:.2f}s")
+
+
+# puts the item on a bounded queue, waiting while it is full unless the pipeline is stopping
+def put(q, item, stop):
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+# streams the planned windows through three stages connected by bounded queues:
+#   fetch(code, date_from, date_to) -> raw response or None, run by `workers` threads
+#   parse(code, raw) -> Data Frame or None, one thread
+#   store(code, df) -> rows written, one thread that owns the database connection
+# every window is stored as soon as it is parsed, so at most about 2 * queue_size windows are held in memory
+# however many codes and years are scraped. on_code_done(code, windows) runs on the store thread once every
+# window of a code was handled, with the windows that were fetched successfully
+class Pipeline:
+    def __init__(self, fetch, parse, store, on_code_done=None, workers=8, queue_size=16):
+        self.fetch = fetch
+        self.parse = parse
+        self.store = store
+        self.on_code_done = on_code_done
+        self.workers = max(1, workers)
+        self.parsed = queue.Queue(maxsize=queue_size)
+        self.raw = queue.Queue(maxsize=queue_size)
+        self.stop = threading.Event()
+        self.errors = []
+        self.stats = [StageStats('fetch'), StageStats('parse'), StageStats('store')]
+        self.elapsed = 0.0
+
+    def guard(self, target, *args):
+        try:
+            target(*args)
+        except BaseException as e:
+            self.errors.append(e)
+            self.stop.set()
+
+    def fetch_stage(self, tasks, lock):
+        stats = self.stats[0]
+        while not self.stop.is_set():
+            with lock:
+                task = next(tasks, None)
+            if task is None:
+                return
+            code, window = task
+            started = time.perf_counter()
+            raw = self.fetch(code, *window)
+            stats.add(time.perf_counter() - started)
+            if not put(self.raw, (code, window, raw), self.stop):
+                return
+
+    def parse_stage(self):
+        stats = self.stats[1]
+        while True:
+            item = self.raw.get()
+            if item is DONE:
+                put(self.parsed, DONE, self.stop)
+                return
+            code, window, raw = item
+            started = time.perf_counter()
+            df = self.parse(code, raw) if raw is not None else None
+            stats.add(time.perf_counter() - started, 0 if df is None else len(df))
+            if not put(self.parsed, (code, window, df), self.stop):
+                return
+
+    def store_stage(self, remaining, progress):
+        stats = self.stats[2]
+        fetched = {code: [] for code in remaining}
+        while True:
+            item = self.parsed.get()
+            if item is DONE:
+                return
+            code, window, df = item
+            if df is not None:
+                started = time.perf_counter()
+                rows = self.store(code, df) if len(df) else 0
+                stats.add(time.perf_counter() - started, rows)
+                fetched[code].append(window)
+            progress.update(1)
+            remaining[code] -= 1
+            if remaining[code] == 0 and self.on_code_done is not None:
+                self.on_code_done(code, fetched.pop(code))
+
+    # plan is a map where key is code and value is a list of (date_from, date_to) windows
+    def run(self, plan):
+        started = time.perf_counter()
+        remaining = {code: len(windows) for code, windows in plan.items()}
+        for code in [code for code, count in remaining.items() if count == 0]:
+            if self.on_code_done is not None:
+                self.on_code_done(code, [])
+
+        tasks = iter([(code, window) for code, windows in plan.items() for window in windows])
+        lock = threading.Lock()
+        progress = tqdm(total=sum(remaining.values()), ncols=100, colour='green')
+        fetchers = [threading.Thread(target=self.guard, args=(self.fetch_stage, tasks, lock), daemon=True)
+                    for _ in range(self.workers)]
+        parser = threading.Thread(target=self.guard, args=(self.parse_stage,), daemon=True)
+        storer = threading.Thread(target=self.guard, args=(self.store_stage, remaining, progress), daemon=True)
+        for thread in fetchers + [parser, storer]:
+            thread.start()
+        for thread in fetchers:
+            thread.join()
+        put(self.raw, DONE, self.stop)
+        while parser.is_alive() or storer.is_alive():
+            if self.stop.is_set():
+                break
+            parser.join(0.1)
+            storer.join(0.1)
+        progress.close()
+        self.elapsed = time.perf_counter() - started
+        if self.errors:
+            raise self.errors[0]
+
+    def report(self):
+        return [stats.report(self.elapsed) for stats in self.stats]
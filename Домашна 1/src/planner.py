@@ -0,0 +1,168 @@
+import json
+import os
+import sqlite3
+from datetime import date, datetime, timedelta
+
+import storage
+
+HORIZON_YEARS = 10
+# stored dates at most this many days apart are treated as covered, that spans weekends and holidays
+MAX_GAP_DAYS = 7
+# mse.mk answers at most a year of history per request
+MAX_WINDOW_DAYS = 365
+WINDOW_FORMAT = "%m/%d/%Y"
+
+
+def years_before(day, years):
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        return day.replace(year=day.year - years, day=28)
+
+
+def to_date(value):
+    return datetime.strptime(value, storage.DATE_FORMAT).date()
+
+
+# merges (start, end) date intervals that overlap or touch
+def merge_intervals(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+# turns sorted stored dates into the intervals they cover, dates closer than MAX_GAP_DAYS are joined
+def spans_of(dates):
+    spans = []
+    for day in dates:
+        if spans and (day - spans[-1][1]).days <= MAX_GAP_DAYS:
+            spans[-1] = (spans[-1][0], day)
+        else:
+            spans.append((day, day))
+    return spans
+
+
+# returns the parts of [start, end] that none of the covered intervals contain
+def find_gaps(start, end, covered):
+    gaps = []
+    cursor = start
+    for covered_start, covered_end in merge_intervals(covered):
+        if covered_end < cursor:
+            continue
+        if covered_start > end:
+            break
+        if covered_start > cursor:
+            gaps.append((cursor, covered_start - timedelta(days=1)))
+        cursor = covered_end + timedelta(days=1)
+    if cursor <= end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+# packs the gaps into as few requests as possible with one sweep: a request spans MAX_WINDOW_DAYS from the
+# first missing day and a new one starts only at the first missing day after it. A request may cover stored
+# days between two gaps, write_frame replaces those rows (tables layout) or upserts them (long layout)
+def to_windows(gaps):
+    windows = []
+    span = timedelta(days=MAX_WINDOW_DAYS)
+    for start, end in gaps:
+        if windows and start < windows[-1][0] + span:
+            last = windows[-1][0] + span - timedelta(days=1)
+            windows[-1] = (windows[-1][0], min(end, last))
+            start = last + timedelta(days=1)
+        while start <= end:
+            windows.append((start, min(end, start + span - timedelta(days=1))))
+            start += span
+    return [(start.strftime(WINDOW_FORMAT), end.strftime(WINDOW_FORMAT)) for start, end in windows]
+
+
+# progress of the current run and the ranges every code was already fetched for, kept in a json file
+# that is rewritten atomically after each code commits
+class Journal:
+    def __init__(self, path):
+        self.path = path
+        self.state = {'run': None, 'coverage': {}}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.state = json.load(f)
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.path)
+
+    # resumes the unfinished run if there is one, returns the codes it already committed. A fresh run takes
+    # over the codes the unfinished one started but did not commit
+    def start_run(self, fresh=False):
+        run = self.state['run']
+        if run is not None and not run['finished'] and not fresh:
+            return set(run['done'])
+        started = sorted(self.unfinished()) if run is not None and not run['finished'] else []
+        self.state['run'] = {'id': datetime.now().isoformat(timespec='seconds'), 'finished': False, 'done': [],
+                             'started': started}
+        self.save()
+        return set()
+
+    # records that the first window of the code is about to be written. A run that crashed after this
+    # left the code's rows written but its market summary and bars not rebuilt
+    def code_started(self, code):
+        started = self.state['run'].setdefault('started', [])
+        if code not in started:
+            started.append(code)
+            self.save()
+
+    # the codes the current run started writing but did not commit
+    def unfinished(self):
+        run = self.state['run']
+        return set(run.get('started', [])) - set(run['done'])
+
+    def coverage(self, code):
+        return [(to_date(start), to_date(end)) for start, end in self.state['coverage'].get(code, [])]
+
+    # records that the code was committed and the windows that were fetched for it. Only closed days
+    # count as covered, today is fetched again on the next run
+    def code_done(self, code, windows):
+        yesterday = date.today() - timedelta(days=1)
+        covered = self.coverage(code)
+        for date_from, date_to in windows:
+            start = datetime.strptime(date_from, WINDOW_FORMAT).date()
+            end = min(datetime.strptime(date_to, WINDOW_FORMAT).date(), yesterday)
+            if start <= end:
+                covered.append((start, end))
+        self.state['coverage'][code] = [[start.strftime(storage.DATE_FORMAT), end.strftime(storage.DATE_FORMAT)]
+                                        for start, end in merge_intervals(covered)]
+        self.state['run']['done'].append(code)
+        self.save()
+
+    def finish(self):
+        self.state['run']['finished'] = True
+        self.save()
+
+
+# returns a map where key is the code and value is the list of (date_from, date_to) windows still missing
+# from the last HORIZON_YEARS: the tail after the latest stored date, the head before the first one and
+# holes in between, minus everything the journal says was already fetched
+def plan(codes, db_file_path, journal, skip=()):
+    today = date.today()
+    horizon = years_before(today, HORIZON_YEARS)
+    since = horizon.strftime(storage.DATE_FORMAT)
+    result = {}
+    conn = sqlite3.connect(db_file_path)
+    try:
+        tables = set(storage.table_names(conn))
+        for code in codes:
+            if code in skip:
+                continue
+            dates = []
+            if code in tables:
+                dates = [to_date(value) for value in storage.stored_dates(conn, code, since)]
+            covered = spans_of(dates) + journal.coverage(code)
+            result[code] = to_windows(find_gaps(horizon, today, covered))
+    finally:
+        conn.close()
+    return result
@@ -0,0 +1,58 @@
+import numpy as np
+
+# bar intervals besides the daily rows, a bar covers a calendar week (Monday to Sunday) or a calendar month
+INTERVALS = ('week', 'month')
+
+
+# returns the first calendar day of the week or month of every day, all as int days since 1970-01-01
+def period_starts(days, interval):
+    days = np.asarray(days, dtype=np.int64)
+    if interval == 'week':
+        # 1970-01-01 was a Thursday, three days after the Monday its week starts on
+        return days - (days + 3) % 7
+    if interval == 'month':
+        return days.astype('datetime64[D]').astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)
+    raise ValueError(f"Unknown interval {interval}")
+
+
+# returns the first calendar day of the period after the one that day belongs to
+def next_period_start(day, interval):
+    start = int(period_starts([day], interval)[0])
+    if interval == 'week':
+        return start + 7
+    return int((np.datetime64(start, 'D').astype('datetime64[M]') + 1).astype('datetime64[D]').astype(np.int64))
+
+
+# builds the bars of daily rows sorted by day, values are float64 arrays named like the snapshot's
+# (price, max, min, volume, turnover). Returns {name: array} with one element per bar:
+#   start, end      first calendar day of the period and the last trading day in it
+#   open, close     price of the first and the last trading day
+#   high, low       highest max and lowest min of the days that have one, the close when no day has
+#   volume, turnover  sums over the days, missing values count as 0
+#   days            number of trading days
+def resample(days, values, interval):
+    days = np.asarray(days, dtype=np.int64)
+    if len(days) == 0:
+        empty = np.zeros(0)
+        return {'start': np.zeros(0, dtype=np.int64), 'end': np.zeros(0, dtype=np.int64), 'open': empty,
+                'high': empty, 'low': empty, 'close': empty, 'volume': empty, 'turnover': empty,
+                'days': np.zeros(0, dtype=np.int64)}
+    starts = period_starts(days, interval)
+    first = np.flatnonzero(np.append(True, starts[1:] != starts[:-1]))
+    last = np.append(first[1:] - 1, len(days) - 1)
+    price = values['price']
+    close = price[last]
+    # a day without trades has a max and min of 0, like in the market summary only real prices count
+    high = np.maximum.reduceat(np.where(values['max'] > 0, values['max'], -np.inf), first)
+    low = np.minimum.reduceat(np.where(values['min'] > 0, values['min'], np.inf), first)
+    return {
+        'start': starts[first],
+        'end': days[last],
+        'open': price[first],
+        'high': np.where(np.isfinite(high), high, close),
+        'low': np.where(np.isfinite(low), low, close),
+        'close': close,
+        'volume': np.add.reduceat(np.nan_to_num(values['volume']), first),
+        'turnover': np.add.reduceat(np.nan_to_num(values['turnover']), first),
+        'days': np.diff(np.append(first, len(days))),
+    }
@@ -0,0 +1,74 @@
+import json
+import os
+import shutil
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+
+import storage
+
+FORMAT_VERSION = 1
+# snapshot array name -> database column, every array is float64 next to an int32 array of days since 1970-01-01
+COLUMNS = {
+    'price': 'Last_trade_price',
+    'max': 'Max',
+    'min': 'Min',
+    'volume': 'Volume',
+    'turnover': 'Total_turnover_in_denars',
+}
+
+
+# reads the history of one code in date order as (int32 days, {name: float64 array}), a date stored
+# twice keeps its last row. Returns None for an empty table
+def read_code(conn, code):
+    columns = ', '.join(storage.quote(column) for column in COLUMNS.values())
+    rows = conn.execute(f"SELECT Date, {columns} FROM {storage.quote(code)} WHERE Date IS NOT NULL ORDER BY Date").fetchall()
+    if len(rows) == 0:
+        return None
+    dates = np.array([row[0] for row in rows], dtype='datetime64[D]')
+    values = np.array([row[1:] for row in rows], dtype=np.float64)
+    keep = np.append(dates[1:] != dates[:-1], True)
+    days = dates[keep].astype(np.int64).astype(np.int32)
+    return days, {name: np.ascontiguousarray(values[keep, i]) for i, name in enumerate(COLUMNS)}
+
+
+# writes every code of the database as .npy arrays that readers can np.load(mmap_mode='r'):
+#   directory/manifest.json, directory/CODE/date.npy, directory/CODE/price.npy, ...
+# the snapshot is built next to the old one and swapped in when complete, returns its manifest
+def export(db_file_path, directory):
+    tmp_directory = f"{directory}.tmp"
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+    manifest = {'format': FORMAT_VERSION, 'created': datetime.now().isoformat(timespec='seconds'),
+                'db_mtime': os.path.getmtime(db_file_path), 'codes': {}}
+
+    conn = sqlite3.connect(db_file_path)
+    try:
+        for code in storage.table_names(conn):
+            try:
+                history = read_code(conn, code)
+            except sqlite3.OperationalError:
+                continue
+            if history is None:
+                continue
+            days, values = history
+            code_directory = os.path.join(tmp_directory, code)
+            os.makedirs(code_directory)
+            np.save(os.path.join(code_directory, 'date.npy'), days)
+            for name, array in values.items():
+                np.save(os.path.join(code_directory, f"{name}.npy"), array)
+            first, last = np.array([days[0], days[-1]]).astype('datetime64[D]').astype(str)
+            manifest['codes'][code] = {'rows': len(days), 'first': str(first), 'last': str(last)}
+    finally:
+        conn.close()
+
+    with open(os.path.join(tmp_directory, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    old_directory = f"{directory}.old"
+    shutil.rmtree(old_directory, ignore_errors=True)
+    if os.path.exists(directory):
+        os.replace(directory, old_directory)
+    os.replace(tmp_directory, directory)
+    shutil.rmtree(old_directory, ignore_errors=True)
+    return manifest
@@ -0,0 +1,390 @@
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import resampling
+
+# version 1 stores Date as sortable YYYY-MM-DD text with an index on it, version 0 used dd.mm.YYYY.
+# version 2 adds the market_summary table, version 3 the bars table
+SCHEMA_VERSION = 3
+DATE_FORMAT = "%Y-%m-%d"
+
+# "tables" keeps one table per code. "long" keeps every code in the prices table keyed by (Code, Date)
+# with a view per code of the same name and columns, so readers written for "tables" keep working
+LAYOUT_TABLES = 'tables'
+LAYOUT_LONG = 'long'
+PRICES_TABLE = 'prices'
+PRICE_FIELDS = ['Last_trade_price', 'Max', 'Min', 'Avg_Price', 'chg', 'Volume', 'Turnover_in_BEST_in_denars',
+                'Total_turnover_in_denars']
+# one row per code with its latest trading day and 52 week range, refreshed once a code is written
+SUMMARY_TABLE = 'market_summary'
+# weekly and monthly OHLCV bars of every code keyed by (Code, Interval, Start), refreshed once a code is written
+BARS_TABLE = 'bars'
+RESERVED_TABLES = {PRICES_TABLE, SUMMARY_TABLE, BARS_TABLE}
+SUMMARY_SOURCE_FIELDS = {'Date', 'Last_trade_price', 'Max', 'Min', 'Volume', 'Total_turnover_in_denars'}
+# the columns bars are built from and the names resampling knows them by
+BAR_SOURCE_FIELDS = ['Last_trade_price', 'Max', 'Min', 'Volume', 'Total_turnover_in_denars']
+BAR_SOURCE_NAMES = ['price', 'max', 'min', 'volume', 'turnover']
+# counter kept next to the database, readers drop what they derived from the data (e.g. computed
+# indicators) when it changes
+DATA_VERSION_FILE = 'data_version'
+
+# applied while the scraper loads data: WAL with synchronous=NORMAL only syncs on checkpoints and a
+# 64MB page cache keeps the tables being appended to in memory
+LOAD_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA temp_store=MEMORY",
+]
+
+
+# converts a scraped column name to the sqlite column name, e.g. "Avg. Price" -> "Avg_Price"
+def field_name(column):
+    return column.replace(' ', '_').replace(',', '').replace('.', '').replace('%', '')
+
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def quote_value(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+# thread safe totals of rows written, transactions and time spent writing them
+class WriteStats:
+    def __init__(self):
+        self.transactions = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, rows, seconds):
+        with self.lock:
+            self.transactions += 1
+            self.rows += rows
+            self.seconds += seconds
+
+    def report(self):
+        rate = self.rows / self.seconds if self.seconds > 0 else 0.0
+        return f"{self.rows} rows in {self.transactions} transactions, {self.seconds:.2f}s ({rate:.0f} rows/s)"
+
+
+stats = WriteStats()
+
+
+# opens the database with the bulk load pragmas applied, the connection may be handed to a writer thread
+def connect_for_load(db_file_path):
+    conn = sqlite3.connect(db_file_path, check_same_thread=False)
+    for pragma in LOAD_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+# copies the WAL back into the database file and switches to a rollback journal, then closes it. SQLite
+# leaves WAL mode only when no other connection has the file open, while a reader such as the Django pool
+# holds it the database stays in WAL mode, with everything checkpointed. Returns the journal mode it is left in
+def finish_load(conn):
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        try:
+            mode = conn.execute("PRAGMA journal_mode=DELETE").fetchone()[0]
+        except sqlite3.OperationalError as e:
+            print(f"Database left in WAL mode: {e}")
+            return 'wal'
+        if mode != 'delete':
+            print(f"Database left in {mode} mode")
+        return mode
+    finally:
+        conn.close()
+
+
+def data_version_path(db_file_path):
+    return os.path.join(os.path.dirname(os.path.abspath(db_file_path)), DATA_VERSION_FILE)
+
+
+def read_data_version(db_file_path):
+    try:
+        with open(data_version_path(db_file_path), encoding='utf-8') as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+# tells readers that the data changed, returns the new version
+def bump_data_version(db_file_path):
+    version = read_data_version(db_file_path) + 1
+    path = data_version_path(db_file_path)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(str(version))
+    os.replace(tmp_path, path)
+    return version
+
+
+# returns the codes stored in the database, tables in the "tables" layout and views in the "long" one
+def table_names(conn):
+    rows = conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%'")
+    return [row[0] for row in rows if row[0] not in RESERVED_TABLES]
+
+
+# returns the sorted distinct dates stored for the code from `since` (YYYY-MM-DD) on, read from the date index
+def stored_dates(conn, code, since):
+    return [row[0] for row in conn.execute(f"SELECT DISTINCT Date FROM {quote(code)} WHERE Date >= ? ORDER BY Date",
+                                           (since,))]
+
+
+def get_layout(conn):
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (PRICES_TABLE,)).fetchone()
+    return LAYOUT_LONG if row else LAYOUT_TABLES
+
+
+def ensure_date_index(conn, code):
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {quote(code + '_Date')} ON {quote(code)} (Date)")
+
+
+# creates the table of that code, or adds the columns an older table is missing
+def ensure_table(conn, code, fields):
+    definitions = [f"{quote(field)} {'TEXT' if field == 'Date' else 'REAL'}" for field in fields]
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {quote(code)} ({', '.join(definitions)})")
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({quote(code)})")}
+    for field, definition in zip(fields, definitions):
+        if field not in existing:
+            conn.execute(f"ALTER TABLE {quote(code)} ADD COLUMN {definition}")
+    ensure_date_index(conn, code)
+
+
+def ensure_summary_table(conn):
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {SUMMARY_TABLE} (Code TEXT PRIMARY KEY, Date TEXT, Price REAL, "
+                 f"Change REAL, Volume REAL, Turnover REAL, High_52w REAL, Low_52w REAL)")
+    for column in ('Date', 'Change', 'Turnover'):
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {SUMMARY_TABLE}_{column} ON {SUMMARY_TABLE} ({column})")
+
+
+# recomputes the summary row of the code from its table (or view): the last trading day with its price,
+# change against the previous trading day, volume and turnover, and the high and low of the year before it.
+# Every value comes from the date index, so it costs a few index lookups however long the history is
+def refresh_summary(conn, code):
+    table = quote(code)
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if not SUMMARY_SOURCE_FIELDS <= existing:
+        # an old table that was created before any row of the code was scraped
+        return
+    conn.execute(f"""
+        INSERT INTO {SUMMARY_TABLE} (Code, Date, Price, Change, Volume, Turnover, High_52w, Low_52w)
+        SELECT {quote_value(code)}, last.Date, last.Last_trade_price,
+               CASE WHEN previous.Last_trade_price > 0
+                    THEN ROUND((last.Last_trade_price - previous.Last_trade_price) * 100.0 / previous.Last_trade_price, 2)
+               END,
+               last.Volume, last.Total_turnover_in_denars,
+               (SELECT MAX(Max) FROM {table} WHERE Date > date(last.Date, '-1 year') AND Max > 0),
+               (SELECT MIN(Min) FROM {table} WHERE Date > date(last.Date, '-1 year') AND Min > 0)
+        FROM (SELECT * FROM {table} WHERE Date IS NOT NULL ORDER BY Date DESC LIMIT 1) AS last
+        LEFT JOIN (SELECT * FROM {table} WHERE Date < (SELECT MAX(Date) FROM {table}) ORDER BY Date DESC LIMIT 1)
+            AS previous ON 1
+        WHERE true
+        ON CONFLICT (Code) DO UPDATE SET Date = excluded.Date, Price = excluded.Price, Change = excluded.Change,
+            Volume = excluded.Volume, Turnover = excluded.Turnover, High_52w = excluded.High_52w,
+            Low_52w = excluded.Low_52w""")
+
+
+# YYYY-MM-DD -> days since 1970-01-01
+def to_day(value):
+    return int(np.datetime64(value, 'D').astype(np.int64))
+
+
+# days since 1970-01-01 -> YYYY-MM-DD
+def from_day(day):
+    return str(np.datetime64(int(day), 'D'))
+
+
+def ensure_bars_table(conn):
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {BARS_TABLE} (Code TEXT NOT NULL, Interval TEXT NOT NULL, "
+                 f"Start TEXT NOT NULL, End TEXT, Open REAL, High REAL, Low REAL, Close REAL, Volume REAL, "
+                 f"Turnover REAL, Days INTEGER, PRIMARY KEY (Code, Interval, Start)) WITHOUT ROWID")
+
+
+# rebuilds the weekly and monthly bars of the code for the periods that contain a day from date_from through
+# date_to (YYYY-MM-DD, None for the first and the last stored day), so a save of recent rows only rebuilds
+# the current week and month from a few rows. A date stored twice keeps its last row, like in the snapshot
+def refresh_bars(conn, code, date_from=None, date_to=None):
+    table = quote(code)
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if not SUMMARY_SOURCE_FIELDS <= existing:
+        # an old table that was created before any row of the code was scraped
+        return
+    ranges = {}
+    for interval in resampling.INTERVALS:
+        first = None if date_from is None else int(resampling.period_starts([to_day(date_from)], interval)[0])
+        end = None if date_to is None else resampling.next_period_start(to_day(date_to), interval)
+        ranges[interval] = (first, end)
+    # the rows of every period to rebuild, a week can start in the month before
+    low = '' if date_from is None else from_day(min(first for first, _ in ranges.values()))
+    high = '9999-12-31' if date_to is None else from_day(max(end for _, end in ranges.values()))
+    rows = conn.execute(f"SELECT Date, {', '.join(quote(field) for field in BAR_SOURCE_FIELDS)} FROM {table} "
+                        f"WHERE Date >= ? AND Date < ? ORDER BY Date", (low, high)).fetchall()
+    days = np.array([row[0] for row in rows], dtype='datetime64[D]').astype(np.int64)
+    values = np.array([row[1:] for row in rows], dtype=np.float64).reshape(len(rows), len(BAR_SOURCE_FIELDS))
+    keep = np.append(days[1:] != days[:-1], True) if len(days) else np.ones(0, dtype=bool)
+    days = days[keep]
+    values = values[keep]
+
+    ensure_bars_table(conn)
+    for interval, (first, end) in ranges.items():
+        inside = np.ones(len(days), dtype=bool)
+        if first is not None:
+            inside &= days >= first
+        if end is not None:
+            inside &= days < end
+        bars = resampling.resample(days[inside], {name: values[inside, i] for i, name in enumerate(BAR_SOURCE_NAMES)},
+                                   interval)
+        conn.execute(f"DELETE FROM {BARS_TABLE} WHERE Code = ? AND Interval = ? AND Start >= ? AND Start < ?",
+                     (code, interval, from_day(first) if first is not None else '',
+                      from_day(end) if end is not None else '9999-12-31'))
+        count = len(bars['start'])
+        columns = [[code] * count, [interval] * count,
+                   np.datetime_as_string(bars['start'].astype('datetime64[D]')).tolist(),
+                   np.datetime_as_string(bars['end'].astype('datetime64[D]')).tolist()]
+        columns += [bars[name].tolist() for name in ('open', 'high', 'low', 'close', 'volume', 'turnover', 'days')]
+        conn.executemany(f"INSERT INTO {BARS_TABLE} (Code, Interval, Start, End, Open, High, Low, Close, Volume, "
+                         f"Turnover, Days) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", zip(*columns))
+
+
+# upgrades an older database in place, all in one transaction. Version 0 dd.mm.YYYY dates are rewritten
+# to YYYY-MM-DD and indexed, before version 2 the market summary and before version 3 the bars are built
+# from every code. Does nothing for a database that is already up to date
+def migrate(db_file_path):
+    conn = sqlite3.connect(db_file_path)
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return version
+        with conn:
+            codes = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")
+                     if not row[0].startswith('sqlite_') and row[0] not in RESERVED_TABLES]
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+            if version < 1:
+                for code in codes:
+                    if code not in tables:
+                        continue
+                    conn.execute(f"UPDATE {quote(code)} "
+                                 f"SET Date = substr(Date, 7, 4) || '-' || substr(Date, 4, 2) || '-' || substr(Date, 1, 2) "
+                                 f"WHERE Date LIKE '__.__.____'")
+                    ensure_date_index(conn, code)
+            if version < 2:
+                ensure_summary_table(conn)
+                for code in codes:
+                    refresh_summary(conn, code)
+            if version < 3:
+                ensure_bars_table(conn)
+                for code in codes:
+                    refresh_bars(conn, code)
+            conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        return SCHEMA_VERSION
+    finally:
+        conn.close()
+
+
+def ensure_prices_table(conn):
+    definitions = ', '.join(f"{quote(field)} REAL" for field in PRICE_FIELDS)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {PRICES_TABLE} (Code TEXT NOT NULL, Date TEXT NOT NULL, {definitions}, "
+                 f"PRIMARY KEY (Code, Date)) WITHOUT ROWID")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {PRICES_TABLE}_Date ON {PRICES_TABLE} (Date)")
+
+
+# the per code view that keeps "SELECT ... FROM CODE" queries working on the long layout
+def ensure_code_view(conn, code):
+    conn.execute(f"CREATE VIEW IF NOT EXISTS {quote(code)} AS SELECT Date, "
+                 f"{', '.join(quote(field) for field in PRICE_FIELDS)} FROM {PRICES_TABLE} WHERE Code = {quote_value(code)}")
+
+
+# moves every per code table into the prices table and replaces it with a view of the same name, in one
+# transaction. Duplicate (code, date) rows collapse into one. Works on an empty database too
+def migrate_to_long(db_file_path):
+    migrate(db_file_path)
+    conn = sqlite3.connect(db_file_path)
+    try:
+        with conn:
+            ensure_prices_table(conn)
+            tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+            for code in tables:
+                if code.startswith('sqlite_') or code in RESERVED_TABLES:
+                    continue
+                existing = {row[1] for row in conn.execute(f"PRAGMA table_info({quote(code)})")}
+                selected = ', '.join(quote(field) if field in existing else 'NULL' for field in PRICE_FIELDS)
+                conn.execute(f"INSERT OR REPLACE INTO {PRICES_TABLE} (Code, Date, "
+                             f"{', '.join(quote(field) for field in PRICE_FIELDS)}) "
+                             f"SELECT ?, Date, {selected} FROM {quote(code)} WHERE Date IS NOT NULL ORDER BY rowid", (code,))
+                conn.execute(f"DROP TABLE {quote(code)}")
+                ensure_code_view(conn, code)
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+
+# returns the column as a float64 array, string columns are cleaned of thousands separators in bulk
+def numeric_column(series):
+    if series.dtype == object:
+        series = pd.to_numeric(series.astype(str).str.replace(',', '', regex=False), errors='coerce')
+    return series.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+# writes the Data Frame of one code with a single executemany in its own transaction, returns the rows written.
+# A date that is already stored is replaced, so the day that was still trading when it was last scraped gets
+# its final prices: the long layout upserts the row and the per code tables delete the dates before inserting
+# them. A date the frame has twice keeps its last row
+def write_frame(conn, code, df, layout=LAYOUT_TABLES):
+    started = time.perf_counter()
+    dates = df['Date'].astype(str)
+    last = ~dates.duplicated(keep='last').to_numpy()
+    df = df[last]
+    dates = dates.to_numpy()[last].tolist()
+    numeric = [col for col in df.columns if col != 'Date']
+    fields = ['Date'] + [field_name(col) for col in numeric]
+    columns = [dates] + [numeric_column(df[col]).tolist() for col in numeric]
+    with conn:
+        if layout == LAYOUT_LONG:
+            updates = ', '.join(f"{quote(field)} = excluded.{quote(field)}" for field in fields[1:])
+            insert_sql = (f"INSERT INTO {PRICES_TABLE} (Code, {', '.join(quote(field) for field in fields)}) "
+                          f"VALUES (?, {', '.join('?' * len(fields))}) "
+                          f"ON CONFLICT (Code, Date) DO UPDATE SET {updates}")
+            columns.insert(0, [code] * len(df))
+            ensure_code_view(conn, code)
+        else:
+            insert_sql = (f"INSERT INTO {quote(code)} ({', '.join(quote(field) for field in fields)}) "
+                          f"VALUES ({', '.join('?' * len(fields))})")
+            ensure_table(conn, code, fields)
+            conn.executemany(f"DELETE FROM {quote(code)} WHERE Date = ?", ((date,) for date in dates))
+        written = conn.executemany(insert_sql, zip(*columns)).rowcount
+    stats.add(written, time.perf_counter() - started)
+    return written
+
+
+# brings the market summary row and the bars of the code up to date with its rows, in one transaction. Run
+# once per code after all its frames are written, not per frame: the bars of the periods from date_from
+# through date_to are rebuilt, by default every period of the code
+def refresh_derived(conn, code, date_from=None, date_to=None):
+    with conn:
+        ensure_summary_table(conn)
+        refresh_summary(conn, code)
+        refresh_bars(conn, code, date_from, date_to)
+
+
+# saves data to database with that path, one transaction per code, in whichever layout the database uses
+def save(data, db_file_path):
+    conn = connect_for_load(db_file_path)
+    try:
+        layout = get_layout(conn)
+        for code, df in data.items():
+            if df is None:
+                continue
+            if write_frame(conn, code, df, layout):
+                dates = df['Date'].astype(str)
+                refresh_derived(conn, code, dates.min(), dates.max())
+    finally:
+        finish_load(conn)
@@ -0,0 +1,92 @@
+import html
+import re
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+EXPECTED_HEADERS = ["Date", "Last trade price", "Max", "Min", "Avg. Price", "%chg.", "Volume",
+                    "Turnover in BEST in denars", "Total turnover in denars"]
+DATE_FORMAT = "%m/%d/%Y"
+
+TABLE_RE = re.compile(r'<table[^>]*\bid=["\']resultsTable["\'][^>]*>(.*?)</table>', re.S | re.I)
+ROW_RE = re.compile(r'<tr[^>]*>(.*?)</tr>', re.S | re.I)
+CELL_RE = re.compile(r'<t[hd][^>]*>(.*?)</t[hd]>', re.S | re.I)
+TAG_RE = re.compile(r'<[^>]+>')
+
+
+# thread safe totals of the time spent parsing responses
+class ParseStats:
+    def __init__(self):
+        self.responses = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, rows, seconds):
+        with self.lock:
+            self.responses += 1
+            self.rows += rows
+            self.seconds += seconds
+
+    def report(self):
+        per_response = self.seconds / self.responses * 1000 if self.responses else 0.0
+        return (f"{self.responses} responses, {self.rows} rows in {self.seconds:.2f}s "
+                f"({per_response:.2f} ms/response)")
+
+
+stats = ParseStats()
+
+
+def cell_text(cell):
+    if '<' in cell:
+        cell = TAG_RE.sub('', cell)
+    if '&' in cell:
+        cell = html.unescape(cell)
+    return cell.strip()
+
+
+# turns "1,650.00" like strings into floats for a whole rows x width block at once, empty cells become 0
+# and cells that are not a number, e.g. "-", become NaN without affecting the rest of the block
+def to_float_block(cells, width):
+    if len(cells) == 0:
+        return np.empty((0, width), dtype=np.float64)
+    block = np.char.replace(np.asarray(cells, dtype=str), ',', '')
+    block[block == ''] = '0'
+    try:
+        return block.astype(np.float64)
+    except ValueError:
+        return pd.DataFrame(block).apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+
+
+def to_dates(values):
+    try:
+        return pd.to_datetime(values, format=DATE_FORMAT)
+    except ValueError:
+        return pd.to_datetime(values)
+
+
+# parses the resultsTable of a symbolhistory page into a Data Frame with a datetime Date column and float
+# columns for the rest. Returns None when the page has no table and raises ValueError for an unknown header
+def parse_results_table(text):
+    started = time.perf_counter()
+    match = TABLE_RE.search(text)
+    if match is None:
+        return None
+
+    rows = ROW_RE.findall(match.group(1))
+    headers = [cell_text(cell) for cell in CELL_RE.findall(rows[0])] if rows else []
+    if headers != EXPECTED_HEADERS:
+        raise ValueError(f"Unexpected resultsTable header: {headers}")
+
+    cells = []
+    for row in rows[1:]:
+        row_cells = CELL_RE.findall(row)
+        if len(row_cells) == len(headers):
+            cells.append([cell_text(cell) for cell in row_cells])
+
+    df = pd.DataFrame(to_float_block([row[1:] for row in cells], len(headers) - 1), columns=headers[1:])
+    df.insert(0, 'Date', to_dates([row[0] for row in cells]))
+    stats.add(len(df), time.perf_counter() - started)
+    return df
@@ -0,0 +1,112 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import http_client
+
+
+# a local server that answers with the given status codes in order, then with 200 and the request count
+class StatusServer:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                status = server.statuses.pop(0) if server.statuses else 200
+                body = str(server.requests).encode()
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/page"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class HttpClientTest(unittest.TestCase):
+    def serve(self, statuses=()):
+        server = StatusServer(statuses)
+        self.addCleanup(server.stop)
+        return server
+
+    def test_retries_until_success(self):
+        server = self.serve([503, 500])
+        client = http_client.HttpClient(retries=3, backoff=0)
+        response = client.get(server.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, '3')
+        self.assertEqual((client.stats.requests, client.stats.retries, client.stats.failures), (3, 2, 0))
+
+    def test_gives_up_after_the_retries(self):
+        server = self.serve([503] * 5)
+        client = http_client.HttpClient(retries=2, backoff=0)
+        self.assertIsNone(client.get(server.url))
+        self.assertEqual((server.requests, client.stats.failures), (3, 1))
+
+    def test_retry_budget_is_shared(self):
+        server = self.serve([503] * 10)
+        client = http_client.HttpClient(retries=5, backoff=0, retry_budget=1)
+        self.assertIsNone(client.get(server.url))
+        self.assertIsNone(client.get(server.url))
+        self.assertEqual(server.requests, 3)
+
+    def test_client_errors_are_not_retried(self):
+        server = self.serve([404])
+        client = http_client.HttpClient(retries=3, backoff=0)
+        self.assertEqual(client.get(server.url).status_code, 404)
+        self.assertEqual(server.requests, 1)
+
+    def test_cache_and_replay(self):
+        server = self.serve()
+        with tempfile.TemporaryDirectory() as directory:
+            client = http_client.HttpClient(backoff=0, cache_dir=directory)
+            self.assertEqual(client.get(server.url, cache_key=('ALK', 'window')).text, '1')
+            self.assertEqual(client.get(server.url, cache_key=('ALK', 'window')).text, '1')
+            self.assertEqual(client.get(server.url, cache_key=('ALK', 'window'), ttl=0).text, '2')
+            replay = http_client.HttpClient(cache_dir=directory, replay=True)
+            self.assertEqual(replay.get(server.url, cache_key=('ALK', 'window')).text, '2')
+            self.assertIsNone(replay.get(server.url, cache_key=('KMB', 'window')))
+        self.assertEqual(server.requests, 2)
+
+
+class HostRateLimiterTest(unittest.TestCase):
+    def test_spaces_requests_to_one_host(self):
+        limiter = http_client.HostRateLimiter(rate=50)
+        started = time.monotonic()
+        for _ in range(6):
+            limiter.acquire('http://example.com/a')
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+    def test_hosts_are_limited_separately(self):
+        limiter = http_client.HostRateLimiter(rate=1)
+        started = time.monotonic()
+        limiter.acquire('http://one.example.com/')
+        limiter.acquire('http://two.example.com/')
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_no_limit(self):
+        limiter = http_client.HostRateLimiter(rate=None)
+        started = time.monotonic()
+        for _ in range(100):
+            limiter.acquire('http://example.com/')
+        self.assertLess(time.monotonic() - started, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../benchmarks')))
+import http_client
+import main
+import planner
+import storage
+from fake_mse import FakeMse
+
+
+# runs the scraper against the local stand-in for mse.mk the benchmarks use
+class ScrapeFakeMseTest(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeMse(codes=3, years=1).start()
+        self.directory = tempfile.TemporaryDirectory()
+        http_client.configure(rate=None, retries=0, cache_dir=None)
+
+    def tearDown(self):
+        self.fake.stop()
+        self.directory.cleanup()
+
+    def test_codes_from_the_given_url(self):
+        self.assertEqual(main.get_codes(self.fake.url), self.fake.codes)
+        self.assertEqual(main.BASE_URL, "https://www.mse.mk/en/stats/symbolhistory")
+
+    def run_main(self, *args):
+        cwd = os.getcwd()
+        os.chdir(self.directory.name)
+        try:
+            main.main(['--base-url', self.fake.url, '--workers', '2', '--rate', '0', '--no-cache', *args])
+        finally:
+            os.chdir(cwd)
+
+    def assert_derived_match(self, conn):
+        summary = conn.execute(f"SELECT COUNT(*) FROM {storage.SUMMARY_TABLE}").fetchone()[0]
+        self.assertEqual(summary, len(self.fake.codes))
+        for code in self.fake.codes:
+            rows = conn.execute(f"SELECT COUNT(DISTINCT Date) FROM {storage.quote(code)}").fetchone()[0]
+            days = conn.execute(f"SELECT SUM(Days) FROM {storage.BARS_TABLE} WHERE Code = ? AND Interval = 'week'",
+                                (code,)).fetchone()[0]
+            self.assertEqual(days, rows)
+
+    def test_full_run(self):
+        os.makedirs(os.path.join(self.directory.name, 'data'))
+        self.run_main('--fresh')
+        conn = sqlite3.connect(os.path.join(self.directory.name, 'data', 'database.sqlite'))
+        try:
+            self.assertEqual(sorted(storage.table_names(conn)), sorted(self.fake.codes))
+            self.assert_derived_match(conn)
+        finally:
+            conn.close()
+
+    def test_resume_rebuilds_the_codes_a_crash_left_unfinished(self):
+        os.makedirs(os.path.join(self.directory.name, 'data'))
+        self.run_main('--fresh')
+        db_path = os.path.join(self.directory.name, 'data', 'database.sqlite')
+        conn = sqlite3.connect(db_path)
+        code = self.fake.codes[0]
+        with conn:
+            conn.execute(f"DELETE FROM {storage.SUMMARY_TABLE} WHERE Code = ?", (code,))
+            conn.execute(f"DELETE FROM {storage.BARS_TABLE} WHERE Code = ?", (code,))
+        conn.close()
+        # the run crashed after writing windows of the first code and before journaling it
+        journal = planner.Journal(os.path.join(self.directory.name, 'data', 'scrape_journal.json'))
+        journal.state['run'] = {'id': 'crashed', 'finished': False, 'done': self.fake.codes[1:], 'started': [code]}
+        journal.save()
+
+        self.run_main()
+        conn = sqlite3.connect(db_path)
+        try:
+            self.assert_derived_match(conn)
+        finally:
+            conn.close()
+
+if __name__ == '__main__':
+    unittest.main()
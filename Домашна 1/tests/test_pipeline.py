@@ -0,0 +1,80 @@
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import pipeline
+
+PLAN = {code: [(f'01/01/{year}', f'12/31/{year}') for year in range(2000, 2010)] for code in ('ALK', 'KMB', 'TEL')}
+
+
+# runs the pipeline on another thread, so a pipeline that hangs fails the test instead of blocking it
+def run_with_timeout(stream, plan, timeout=10):
+    result = {}
+
+    def target():
+        try:
+            stream.run(plan)
+        except BaseException as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return thread.is_alive(), result.get('error')
+
+
+class PipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.stored = []
+        self.done = []
+
+    def fetch(self, code, date_from, date_to):
+        return f'{code} {date_from} {date_to}'
+
+    def parse(self, code, raw):
+        return [raw]
+
+    def store(self, code, df):
+        self.stored.append(df[0])
+        return 1
+
+    def on_code_done(self, code, windows):
+        self.done.append((code, len(windows)))
+
+    def test_every_window_is_stored(self):
+        stream = pipeline.Pipeline(self.fetch, self.parse, self.store, self.on_code_done, workers=3, queue_size=2)
+        hung, error = run_with_timeout(stream, {**PLAN, 'ADIN': []})
+        self.assertFalse(hung)
+        self.assertIsNone(error)
+        self.assertEqual(len(self.stored), 30)
+        self.assertEqual(sorted(self.done), [('ADIN', 0), ('ALK', 10), ('KMB', 10), ('TEL', 10)])
+
+    def test_failing_fetch_is_raised(self):
+        def fetch(code, date_from, date_to):
+            if code == 'KMB':
+                raise ConnectionError('fetch failed')
+            return self.fetch(code, date_from, date_to)
+
+        stream = pipeline.Pipeline(fetch, self.parse, self.store, self.on_code_done, workers=3, queue_size=2)
+        hung, error = run_with_timeout(stream, PLAN)
+        self.assertFalse(hung)
+        self.assertIsInstance(error, ConnectionError)
+        self.assertNotIn(('KMB', 10), self.done)
+
+    def test_failing_store_is_raised(self):
+        def store(code, df):
+            if len(self.stored) == 5:
+                raise OSError('disk full')
+            return self.store(code, df)
+
+        stream = pipeline.Pipeline(self.fetch, self.parse, store, self.on_code_done, workers=3, queue_size=2)
+        hung, error = run_with_timeout(stream, PLAN)
+        self.assertFalse(hung)
+        self.assertIsInstance(error, OSError)
+        self.assertEqual(len(self.stored), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
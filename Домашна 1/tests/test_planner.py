@@ -0,0 +1,170 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import planner
+import storage
+
+
+def day(value):
+    return planner.to_date(value)
+
+
+def window(start, end):
+    return start.strftime(planner.WINDOW_FORMAT), end.strftime(planner.WINDOW_FORMAT)
+
+
+class IntervalsTest(unittest.TestCase):
+    def test_merge_intervals_joins_overlapping_and_touching(self):
+        self.assertEqual(planner.merge_intervals([(day('2024-01-10'), day('2024-01-20')),
+                                                  (day('2024-01-01'), day('2024-01-09')),
+                                                  (day('2024-01-15'), day('2024-01-25')),
+                                                  (day('2024-02-01'), day('2024-02-02'))]),
+                         [(day('2024-01-01'), day('2024-01-25')), (day('2024-02-01'), day('2024-02-02'))])
+
+    def test_spans_of_bridges_weekends_but_not_holes(self):
+        dates = [day('2024-01-05'), day('2024-01-08'), day('2024-01-15'), day('2024-01-23')]
+        self.assertEqual(planner.spans_of(dates),
+                         [(day('2024-01-05'), day('2024-01-15')), (day('2024-01-23'), day('2024-01-23'))])
+        self.assertEqual(planner.spans_of([]), [])
+
+    def test_find_gaps(self):
+        covered = [(day('2024-01-10'), day('2024-01-20')), (day('2023-12-01'), day('2024-01-02'))]
+        self.assertEqual(planner.find_gaps(day('2024-01-01'), day('2024-01-31'), covered),
+                         [(day('2024-01-03'), day('2024-01-09')), (day('2024-01-21'), day('2024-01-31'))])
+        self.assertEqual(planner.find_gaps(day('2024-01-01'), day('2024-01-31'), []),
+                         [(day('2024-01-01'), day('2024-01-31'))])
+        self.assertEqual(planner.find_gaps(day('2024-01-01'), day('2024-01-31'),
+                                           [(day('2023-01-01'), day('2024-12-31'))]), [])
+
+
+class ToWindowsTest(unittest.TestCase):
+    def test_long_gap_is_split_into_full_windows(self):
+        start = day('2020-01-01')
+        span = timedelta(days=planner.MAX_WINDOW_DAYS)
+        end = start + 2 * span + timedelta(days=9)
+        self.assertEqual(planner.to_windows([(start, end)]), [
+            window(start, start + span - timedelta(days=1)),
+            window(start + span, start + 2 * span - timedelta(days=1)),
+            window(start + 2 * span, end),
+        ])
+
+    def test_gaps_within_a_window_share_it(self):
+        gaps = [(day('2020-01-01'), day('2020-01-10')), (day('2020-06-01'), day('2020-06-05'))]
+        self.assertEqual(planner.to_windows(gaps), [window(day('2020-01-01'), day('2020-06-05'))])
+
+    def test_next_window_starts_after_the_full_span(self):
+        # the second gap starts inside the first window and runs past it, the window is filled up to its
+        # full span before a new one starts, even over stored days
+        gaps = [(day('2020-01-01'), day('2020-01-10')), (day('2020-12-01'), day('2021-03-01'))]
+        last = day('2020-01-01') + timedelta(days=planner.MAX_WINDOW_DAYS - 1)
+        self.assertEqual(planner.to_windows(gaps), [window(day('2020-01-01'), last),
+                                                    window(last + timedelta(days=1), day('2021-03-01'))])
+
+    def test_gap_after_a_window_starts_a_new_one(self):
+        gaps = [(day('2020-01-01'), day('2020-01-10')), (day('2021-06-01'), day('2021-06-05'))]
+        self.assertEqual(planner.to_windows(gaps), [window(day('2020-01-01'), day('2020-01-10')),
+                                                    window(day('2021-06-01'), day('2021-06-05'))])
+
+    def test_no_gaps(self):
+        self.assertEqual(planner.to_windows([]), [])
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'scrape_journal.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_unfinished_run_is_resumed(self):
+        journal = planner.Journal(self.path)
+        self.assertEqual(journal.start_run(), set())
+        run_id = journal.state['run']['id']
+        journal.code_done('ALK', [])
+        journal = planner.Journal(self.path)
+        self.assertEqual(journal.start_run(), {'ALK'})
+        self.assertEqual(journal.state['run']['id'], run_id)
+
+    def test_finished_run_is_not_resumed(self):
+        journal = planner.Journal(self.path)
+        journal.start_run()
+        journal.code_done('ALK', [])
+        journal.finish()
+        journal = planner.Journal(self.path)
+        self.assertEqual(journal.start_run(), set())
+        self.assertEqual(journal.state['run']['done'], [])
+
+    def test_resume_after_crash(self):
+        journal = planner.Journal(self.path)
+        journal.start_run()
+        journal.code_started('ALK')
+        journal.code_done('ALK', [])
+        # the run crashes after the first window of KMB was written
+        journal.code_started('KMB')
+        journal = planner.Journal(self.path)
+        self.assertEqual(journal.start_run(), {'ALK'})
+        self.assertEqual(journal.unfinished(), {'KMB'})
+        # a fresh run does not resume, but still has to rebuild KMB
+        journal = planner.Journal(self.path)
+        self.assertEqual(journal.start_run(fresh=True), set())
+        self.assertEqual(journal.unfinished(), {'KMB'})
+
+    def test_code_done_clamps_coverage_to_yesterday(self):
+        today = date.today()
+        journal = planner.Journal(self.path)
+        journal.start_run()
+        journal.code_done('ALK', [window(today - timedelta(days=10), today), window(today, today)])
+        self.assertEqual(journal.coverage('ALK'), [(today - timedelta(days=10), today - timedelta(days=1))])
+        self.assertEqual(planner.Journal(self.path).coverage('ALK'), journal.coverage('ALK'))
+
+
+class PlanTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.directory.name, 'database.sqlite')
+        self.journal = planner.Journal(os.path.join(self.directory.name, 'scrape_journal.json'))
+        self.journal.start_run()
+        self.today = date.today()
+        self.horizon = planner.years_before(self.today, planner.HORIZON_YEARS)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def store(self, code, days):
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            conn.execute(f"CREATE TABLE {storage.quote(code)} (Date TEXT)")
+            conn.executemany(f"INSERT INTO {storage.quote(code)} VALUES (?)",
+                             [(value.strftime(storage.DATE_FORMAT),) for value in days])
+        conn.close()
+
+    def test_code_without_rows_plans_the_whole_horizon(self):
+        self.store('ALK', [])
+        windows = planner.plan(['ALK'], self.db_path, self.journal)['ALK']
+        self.assertEqual(windows[0][0], self.horizon.strftime(planner.WINDOW_FORMAT))
+        self.assertEqual(windows[-1][1], self.today.strftime(planner.WINDOW_FORMAT))
+        self.assertEqual(len(windows), planner.HORIZON_YEARS + 1)
+
+    def test_hole_in_the_middle(self):
+        hole = (self.today - timedelta(days=100), self.today - timedelta(days=61))
+        days = [self.horizon + timedelta(days=offset) for offset in range((self.today - self.horizon).days)]
+        self.store('ALK', [value for value in days if not hole[0] <= value <= hole[1]])
+        # the hole and today are fetched with one request that also covers the stored days between them
+        self.assertEqual(planner.plan(['ALK'], self.db_path, self.journal),
+                         {'ALK': [window(hole[0], self.today)]})
+
+    def test_journaled_coverage_and_skipped_codes(self):
+        self.store('ALK', [])
+        self.journal.code_done('ALK', [window(self.horizon, self.today)])
+        self.assertEqual(planner.plan(['ALK', 'KMB'], self.db_path, self.journal, skip={'KMB'}),
+                         {'ALK': [window(self.today, self.today)]})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import storage
+
+
+# a scraped frame with the given (date, price) rows, the other prices follow the last trade price
+def make_frame(rows):
+    return pd.DataFrame({
+        'Date': pd.to_datetime([date for date, _ in rows]).date,
+        'Last trade price': [price for _, price in rows],
+        'Max': [price + 1 for _, price in rows],
+        'Min': [price - 1 for _, price in rows],
+        'Avg. Price': [price for _, price in rows],
+        '%chg.': [0.0 for _ in rows],
+        'Volume': [10.0 for _ in rows],
+        'Turnover in BEST in denars': [10.0 * price for _, price in rows],
+        'Total turnover in denars': [10.0 * price for _, price in rows],
+    })
+
+
+class WriteFrameTest(unittest.TestCase):
+    layout = storage.LAYOUT_TABLES
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.directory.name, 'database.sqlite')
+        storage.migrate(self.db_path)
+        if self.layout == storage.LAYOUT_LONG:
+            storage.migrate_to_long(self.db_path)
+        self.conn = sqlite3.connect(self.db_path)
+        self.assertEqual(storage.get_layout(self.conn), self.layout)
+
+    def tearDown(self):
+        self.conn.close()
+        self.directory.cleanup()
+
+    def write(self, rows):
+        return storage.write_frame(self.conn, 'ALK', make_frame(rows), self.layout)
+
+    def stored(self):
+        return self.conn.execute('SELECT Date, Last_trade_price FROM "ALK" ORDER BY Date').fetchall()
+
+    def test_new_rows(self):
+        self.assertEqual(self.write([('2024-01-02', 1.0), ('2024-01-03', 2.0)]), 2)
+        self.assertEqual(self.stored(), [('2024-01-02', 1.0), ('2024-01-03', 2.0)])
+
+    def test_writing_again_is_idempotent(self):
+        rows = [('2024-01-02', 1.0), ('2024-01-03', 2.0)]
+        self.write(rows)
+        self.write(rows)
+        self.assertEqual(self.stored(), [('2024-01-02', 1.0), ('2024-01-03', 2.0)])
+
+    def test_stored_date_is_updated(self):
+        self.write([('2024-01-02', 1.0), ('2024-01-03', 2.0)])
+        self.assertEqual(self.write([('2024-01-03', 5.0), ('2024-01-04', 3.0)]), 2)
+        self.assertEqual(self.stored(), [('2024-01-02', 1.0), ('2024-01-03', 5.0), ('2024-01-04', 3.0)])
+
+    def test_date_twice_in_a_frame_keeps_last_row(self):
+        self.assertEqual(self.write([('2024-01-02', 1.0), ('2024-01-02', 4.0)]), 1)
+        self.assertEqual(self.stored(), [('2024-01-02', 4.0)])
+
+    def test_empty_frame(self):
+        self.assertEqual(self.write([]), 0)
+
+    def test_summary_and_bars_are_refreshed_once_per_code(self):
+        self.write([('2024-01-02', 1.0), ('2024-01-03', 2.0)])
+        self.write([('2024-01-03', 5.0)])
+        storage.refresh_derived(self.conn, 'ALK')
+        self.assertEqual(self.conn.execute(f"SELECT Date, Price, Change FROM {storage.SUMMARY_TABLE}").fetchall(),
+                         [('2024-01-03', 5.0, 400.0)])
+        self.assertEqual(self.conn.execute(f"SELECT Start, Open, Close, High, Days FROM {storage.BARS_TABLE} "
+                                           f"WHERE Interval = 'week'").fetchall(),
+                         [('2024-01-01', 1.0, 5.0, 6.0, 2)])
+
+    def test_save_refreshes_summary_and_bars(self):
+        self.conn.close()
+        storage.save({'ALK': make_frame([('2024-01-02', 1.0), ('2024-01-09', 2.0)])}, self.db_path)
+        self.conn = sqlite3.connect(self.db_path)
+        self.assertEqual(self.conn.execute(f"SELECT Code, Date, Price FROM {storage.SUMMARY_TABLE}").fetchall(),
+                         [('ALK', '2024-01-09', 2.0)])
+        self.assertEqual(self.conn.execute(f"SELECT Start FROM {storage.BARS_TABLE} WHERE Interval = 'week' "
+                                           f"ORDER BY Start").fetchall(), [('2024-01-01',), ('2024-01-08',)])
+
+
+class WriteFrameLongLayoutTest(WriteFrameTest):
+    layout = storage.LAYOUT_LONG
+
+
+class FinishLoadTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.directory.name, 'database.sqlite')
+        storage.migrate(self.db_path)
+        self.conn = storage.connect_for_load(self.db_path)
+        self.conn.execute("PRAGMA busy_timeout=0")
+        storage.write_frame(self.conn, 'ALK', make_frame([('2024-01-02', 1.0)]))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def journal_mode(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute("PRAGMA journal_mode").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_leaves_wal_mode(self):
+        self.assertEqual(storage.finish_load(self.conn), 'delete')
+        self.assertEqual(self.journal_mode(), 'delete')
+
+    def test_stays_in_wal_mode_while_a_reader_has_the_file_open(self):
+        reader = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        try:
+            self.assertEqual(reader.execute('SELECT COUNT(*) FROM "ALK"').fetchone()[0], 1)
+            self.assertEqual(storage.finish_load(self.conn), 'wal')
+            self.assertEqual(reader.execute('SELECT COUNT(*) FROM "ALK"').fetchone()[0], 1)
+        finally:
+            reader.close()
+        self.assertEqual(self.journal_mode(), 'wal')
+
+
+if __name__ == '__main__':
+    unittest.main()
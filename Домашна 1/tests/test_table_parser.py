@@ -0,0 +1,73 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import table_parser
+
+
+# a symbolhistory page with a resultsTable of the given rows, each row a list of cell strings
+def make_page(rows, headers=None):
+    headers = headers or table_parser.EXPECTED_HEADERS
+    head = ''.join(f"<th>{header}</th>" for header in headers)
+    body = ''.join('<tr>' + ''.join(f"<td>{cell}</td>" for cell in row) + '</tr>' for row in rows)
+    return (f'<html><table id="resultsTable" class="table"><thead><tr>{head}</tr></thead>'
+            f'<tbody>{body}</tbody></table></html>')
+
+
+class ParseResultsTableTest(unittest.TestCase):
+    def test_numbers_and_dates(self):
+        page = make_page([['11/8/2024', '24,900.00', '25,000.00', '24,600.00', '24,810.11', '0.40', '312',
+                           '7,740,754', '7,740,754']])
+        df = table_parser.parse_results_table(page)
+        self.assertEqual(list(df.columns), table_parser.EXPECTED_HEADERS)
+        self.assertEqual(df['Date'].iloc[0].strftime('%Y-%m-%d'), '2024-11-08')
+        self.assertEqual(df['Last trade price'].iloc[0], 24900.0)
+        self.assertEqual(df['Total turnover in denars'].iloc[0], 7740754.0)
+
+    def test_empty_cells_are_zero(self):
+        page = make_page([['11/8/2024', '24,900.00', '', '', '24,810.11', '', '312', '', '7,740,754']])
+        df = table_parser.parse_results_table(page)
+        self.assertEqual(df['Max'].iloc[0], 0.0)
+        self.assertEqual(df['Turnover in BEST in denars'].iloc[0], 0.0)
+
+    def test_non_numeric_cell_only_affects_its_cell(self):
+        page = make_page([
+            ['11/8/2024', '24,900.00', '-', '24,600.00', '24,810.11', '0.40', '312', '7,740,754', '7,740,754'],
+            ['11/7/2024', '24,800.00', '24,900.00', '24,500.00', '24,700.00', 'n/a', '100', '2,480,000', '2,480,000'],
+        ])
+        df = table_parser.parse_results_table(page)
+        self.assertEqual(len(df), 2)
+        self.assertTrue(np.isnan(df['Max'].iloc[0]))
+        self.assertTrue(np.isnan(df['%chg.'].iloc[1]))
+        self.assertEqual(df['Min'].iloc[0], 24600.0)
+        self.assertEqual(df['Last trade price'].iloc[1], 24800.0)
+
+    def test_markup_and_entities_in_cells(self):
+        page = make_page([['<span>11/8/2024</span>', '<b>1&#44;650.00</b>', '1,700.00', '1,600.00', '1,650.00',
+                           '0.00', '10', '16,500', '16,500']])
+        df = table_parser.parse_results_table(page)
+        self.assertEqual(df['Last trade price'].iloc[0], 1650.0)
+
+    def test_rows_with_a_different_cell_count_are_skipped(self):
+        page = make_page([['11/8/2024', '1.00'], ['11/7/2024', '1', '1', '1', '1', '0', '1', '1', '1']])
+        df = table_parser.parse_results_table(page)
+        self.assertEqual(len(df), 1)
+
+    def test_no_rows(self):
+        df = table_parser.parse_results_table(make_page([]))
+        self.assertEqual(len(df), 0)
+        self.assertEqual(list(df.columns), table_parser.EXPECTED_HEADERS)
+
+    def test_no_table(self):
+        self.assertIsNone(table_parser.parse_results_table('<html><p>No data</p></html>'))
+
+    def test_unknown_header(self):
+        with self.assertRaises(ValueError):
+            table_parser.parse_results_table(make_page([], headers=['Date', 'Price']))
+
+
+if __name__ == '__main__':
+    unittest.main()
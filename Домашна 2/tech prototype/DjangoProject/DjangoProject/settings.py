@@ -43,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'StocksApp.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -88,7 +89,32 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'DjangoProject.wsgi.application'
 
-external_db_path = Path(__file__).resolve().parents[4] / "Домашна 1" / "src" / "data" / "database.sqlite"
+# the scraper's database, STOCKS_EXTERNAL_DB points the app at another one, e.g. a synthetic benchmark database
+external_db_path = Path(os.environ.get('STOCKS_EXTERNAL_DB')
+                        or Path(__file__).resolve().parents[4] / "Домашна 1" / "src" / "data" / "database.sqlite")
+# columnar copy of the external database the scraper publishes after each run
+EXTERNAL_SNAPSHOT_DIR = external_db_path.parent / "snapshot"
+# bumped by the scraper after each run, computed indicators are cached until it changes
+EXTERNAL_DATA_VERSION_FILE = external_db_path.parent / "data_version"
+INDICATOR_CACHE_SIZE = 512
+# bytes of price arrays the process keeps, the least recently used symbols are dropped beyond it
+PRICE_STORE_BYTES = 128 * 2 ** 20
+# the indicators over all time of every symbol, stepped forward only through the rows added since they were
+# stored. STOCKS_INDICATOR_STATE puts the file elsewhere when the data directory is read only
+INDICATOR_STATE_DB = Path(os.environ.get('STOCKS_INDICATOR_STATE') or external_db_path.parent / "indicator_state.sqlite")
+# threads, each with a read only connection to the external database, that the async stock views run
+# their queries and indicator math on
+STOCK_READERS = 8
+# worker processes the screener computes indicators of many symbols on, 1 computes them in the request
+SCREENER_PROCESSES = os.cpu_count() or 1
+# how often the live stream checks the external database for new rows, and how long a disconnected
+# EventSource waits before reconnecting
+STREAM_POLL_SECONDS = 5
+STREAM_RETRY_MS = 5000
+# requests slower than this are logged with their phases, None logs none. Setting METRICS_PROFILE_DIR
+# profiles every request and writes the profile of each slow one there as a .prof file
+METRICS_SLOW_REQUEST_SECONDS = 1.0
+METRICS_PROFILE_DIR = os.environ.get('STOCKS_PROFILE_DIR')
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
@@ -25,5 +25,8 @@ urlpatterns = [
     path('homepage/', views.homepage, name='homepage'),
     path('search/', views.search, name='search'),
     path('stock_data/<str:name>/', views.stock_data, name='stock_data'),
+    path('screener/', views.screener, name='screener'),
+    path('stream/<str:name>/', views.stream, name='stream'),
+    path('metrics/', views.metrics_view, name='metrics'),
 ]
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,105 @@
+import os
+import sqlite3
+import threading
+
+# tables of the external database that are not stock symbols
+RESERVED_TABLES = ('prices', 'market_summary', 'bars')
+# every substring up to this length is indexed, longer search terms intersect the sets of their n-grams
+GRAM = 3
+
+
+# identifies one state of the database file: any write, including a new symbol table (which also bumps
+# PRAGMA schema_version), changes the mtime or size of the file or of its write-ahead log
+def file_stamp(db_path):
+    stamp = []
+    for path in (db_path, f"{db_path}-wal"):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stamp.append(None)
+            continue
+        stamp.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(stamp)
+
+
+# the symbols of the external database in sqlite_master order with their row count, first and last date,
+# and an index of every 1 to GRAM long substring of the symbols for search
+class SymbolCatalog:
+    def __init__(self, names, info, stamp=None):
+        self.names = names
+        self.info = info
+        self.stamp = stamp
+        self.keys = [name.upper() for name in names]
+        self.grams = {}
+        for position, key in enumerate(self.keys):
+            for n in range(1, GRAM + 1):
+                for start in range(len(key) - n + 1):
+                    self.grams.setdefault(key[start:start + n], set()).add(position)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.info
+
+    # returns the symbols containing the text in catalog order, case insensitive
+    def search(self, text):
+        text = text.upper()
+        if len(text) <= GRAM:
+            positions = self.grams.get(text, ())
+        else:
+            sets = [self.grams.get(text[start:start + GRAM]) for start in range(len(text) - GRAM + 1)]
+            if any(positions is None for positions in sets):
+                return []
+            sets.sort(key=len)
+            positions = [position for position in sets[0].intersection(*sets[1:]) if text in self.keys[position]]
+        return [self.names[position] for position in sorted(positions)]
+
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+# reads the symbols and their metadata with one read only connection
+def load(db_path):
+    stamp = file_stamp(db_path)
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("SELECT name, type FROM sqlite_master WHERE type IN ('table', 'view') "
+                            "AND name NOT LIKE 'sqlite_%'").fetchall()
+        names = [name for name, _ in rows if name not in RESERVED_TABLES]
+        info = {}
+        if ('prices', 'table') in rows:
+            # long layout, the per code views all read the prices table
+            for code, count, first, last in conn.execute("SELECT Code, COUNT(*), MIN(Date), MAX(Date) "
+                                                         "FROM prices GROUP BY Code"):
+                info[code] = {'rows': count, 'first': first, 'last': last}
+        for name in names:
+            if name not in info:
+                try:
+                    count, first, last = conn.execute(f"SELECT COUNT(*), MIN(Date), MAX(Date) FROM {quote(name)}").fetchone()
+                except sqlite3.OperationalError:
+                    count, first, last = 0, None, None
+                info[name] = {'rows': count, 'first': first, 'last': last}
+    finally:
+        conn.close()
+    return SymbolCatalog(names, {name: info[name] for name in names}, stamp)
+
+
+_lock = threading.Lock()
+_current = {}
+
+
+# returns the catalog of the database, it is loaded on first use and again whenever the file changed
+def current(db_path):
+    db_path = str(db_path)
+    stamp = file_stamp(db_path)
+    catalog = _current.get(db_path)
+    if catalog is not None and catalog.stamp == stamp:
+        return catalog
+    with _lock:
+        catalog = _current.get(db_path)
+        if catalog is None or catalog.stamp != stamp:
+            catalog = load(db_path)
+            _current[db_path] = catalog
+    return catalog
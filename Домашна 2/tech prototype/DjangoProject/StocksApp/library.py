@@ -0,0 +1,22 @@
+import importlib
+import os
+import sys
+
+# ta, and with it numpy and pandas, is imported while site-packages is still on the path
+import ta
+
+# the analysis library of Домашна 3, its modules import each other as top level modules
+LIBRARY_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../../Домашна 3/src'))
+
+
+# imports the modules of the library by name and returns them in that order, site-packages is hidden while
+# they are imported. Needs no Django settings, the screener worker processes import it too
+def import_library(*names):
+    original_sys_path = sys.path.copy()
+    sys.path = [path for path in sys.path if 'site-packages' not in path]
+    sys.path.insert(0, LIBRARY_DIR)
+    sys.path.append(os.path.join(os.path.dirname(sys.executable), 'Lib', 'site-packages'))
+    try:
+        return [importlib.import_module(name) for name in names]
+    finally:
+        sys.path = original_sys_path
@@ -0,0 +1,212 @@
+import contextvars
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+# upper bounds of the histogram buckets, seconds for latencies and a count for SQL queries per request
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250)
+
+
+# a Prometheus style histogram: cumulative bucket counts, sum and count
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        for bound, count in zip(self.buckets, self.counts):
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {count}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{{labels}}} {self.sum:.6f}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+# what one request spent its time on, shared by the event loop and the reader threads it hands work to
+class RequestMetrics:
+    def __init__(self, profile=False):
+        self.phases = {}
+        self.queries = 0
+        self.profile = profile
+        self.profiles = []
+        self.lock = threading.Lock()
+
+    def add_phase(self, name, seconds):
+        with self.lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def add_query(self):
+        with self.lock:
+            self.queries += 1
+
+
+# totals over every request since the server started
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.latency = {}
+        self.phases = {}
+        self.queries = {}
+        self.slow = 0
+
+    def record(self, view, method, status, seconds, request_metrics):
+        with self.lock:
+            key = (view, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.latency.setdefault(view, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            for phase, phase_seconds in request_metrics.phases.items():
+                self.phases.setdefault((view, phase), Histogram(LATENCY_BUCKETS)).observe(phase_seconds)
+            self.queries.setdefault(view, Histogram(QUERY_BUCKETS)).observe(request_metrics.queries)
+
+    # the metrics in the Prometheus text exposition format, extra is a list of (name, help, value) gauges
+    def render(self, extra=()):
+        lines = []
+        with self.lock:
+            lines += ['# HELP stocks_requests_total Requests handled, by view, method and status.',
+                      '# TYPE stocks_requests_total counter']
+            for (view, method, status), count in sorted(self.requests.items()):
+                lines.append(f'stocks_requests_total{{view="{view}",method="{method}",status="{status}"}} {count}')
+            lines += ['# HELP stocks_request_seconds Time until the view returned its response.',
+                      '# TYPE stocks_request_seconds histogram']
+            for view, histogram in sorted(self.latency.items()):
+                lines += histogram.lines('stocks_request_seconds', f'view="{view}"')
+            lines += ['# HELP stocks_phase_seconds Time a request spent in each phase.',
+                      '# TYPE stocks_phase_seconds histogram']
+            for (view, phase), histogram in sorted(self.phases.items()):
+                lines += histogram.lines('stocks_phase_seconds', f'view="{view}",phase="{phase}"')
+            lines += ['# HELP stocks_sql_queries SQL queries run per request.',
+                      '# TYPE stocks_sql_queries histogram']
+            for view, histogram in sorted(self.queries.items()):
+                lines += histogram.lines('stocks_sql_queries', f'view="{view}"')
+            lines += ['# HELP stocks_slow_requests_total Requests slower than METRICS_SLOW_REQUEST_SECONDS.',
+                      '# TYPE stocks_slow_requests_total counter', f'stocks_slow_requests_total {self.slow}']
+        for name, help_text, value in extra:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {value}']
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+current = contextvars.ContextVar('stocks_request_metrics', default=None)
+
+
+# times the block as a phase of the current request, does nothing outside of a request
+@contextmanager
+def phase(name):
+    request_metrics = current.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if request_metrics is not None:
+            request_metrics.add_phase(name, time.perf_counter() - started)
+
+
+def count_query():
+    request_metrics = current.get()
+    if request_metrics is not None:
+        request_metrics.add_query()
+
+
+# wraps work handed to another thread so it is counted for the request, and profiled when it is profiled.
+# The context is copied, so the other thread sees the same RequestMetrics
+def bind(function):
+    context = contextvars.copy_context()
+    request_metrics = context.get(current)
+
+    def run(*args, **kwargs):
+        if request_metrics is None or not request_metrics.profile:
+            return context.run(function, *args, **kwargs)
+        profile = cProfile.Profile()
+        try:
+            return context.run(profile.runcall, function, *args, **kwargs)
+        finally:
+            with request_metrics.lock:
+                request_metrics.profiles.append(profile)
+
+    return run
+
+
+def counting_executor(execute, sql, params, many, context):
+    count_query()
+    return execute(sql, params, many, context)
+
+
+# writes the profiles of a slow request to METRICS_PROFILE_DIR as a .prof file for pstats or snakeviz
+def dump_profile(view, request_metrics):
+    directory = settings.METRICS_PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    path = os.path.join(directory, f"{stamp}-{view}.prof")
+    stats = pstats.Stats(*request_metrics.profiles)
+    stats.dump_stats(path)
+    return path
+
+
+# records the latency, phases and SQL query count of every request in the registry. Requests slower than
+# METRICS_SLOW_REQUEST_SECONDS are logged with their phases. When METRICS_PROFILE_DIR is set every request
+# is profiled and the profiles of the slow ones are written there
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def start(self):
+        request_metrics = RequestMetrics(profile=settings.METRICS_PROFILE_DIR is not None)
+        return request_metrics, current.set(request_metrics), time.perf_counter()
+
+    def finish(self, request, response, request_metrics, token, started):
+        seconds = time.perf_counter() - started
+        current.reset(token)
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match is not None else 'unmatched'
+        registry.record(view, request.method, response.status_code, seconds, request_metrics)
+        if settings.METRICS_SLOW_REQUEST_SECONDS is not None and seconds >= settings.METRICS_SLOW_REQUEST_SECONDS:
+            with registry.lock:
+                registry.slow += 1
+            phases = ', '.join(f"{name} {value * 1000:.1f}ms" for name, value in request_metrics.phases.items())
+            message = (f"Slow request {request.method} {request.get_full_path()}: {seconds * 1000:.1f}ms "
+                       f"({phases or 'no phases'}), {request_metrics.queries} SQL queries")
+            if request_metrics.profiles:
+                message += f", profile at {dump_profile(view, request_metrics)}"
+            print(message, file=sys.stderr)
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request_metrics, token, started = self.start()
+        with connections['default'].execute_wrapper(counting_executor):
+            if request_metrics.profile:
+                response = bind(self.get_response)(request)
+            else:
+                response = self.get_response(request)
+        return self.finish(request, response, request_metrics, token, started)
+
+    async def __acall__(self, request):
+        request_metrics, token, started = self.start()
+        response = await self.get_response(request)
+        return self.finish(request, response, request_metrics, token, started)
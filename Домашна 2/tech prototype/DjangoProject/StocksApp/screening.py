@@ -0,0 +1,65 @@
+from StocksApp.library import import_library
+
+# imported by the screener worker processes as well, so nothing here may need Django settings
+technical_analysis, indicator_registry = import_library('technical_analysis', 'indicator_registry')
+
+SIGNALS = ['Buy', 'Sell', 'Hold']
+# every indicator calc_indicators returns, in its order
+INDICATOR_NAMES = [name for names in indicator_registry.registry.groups().values() for name in names]
+# what the screener can be sorted by besides the indicators
+SORT_KEYS = ['symbol', 'price', 'score']
+
+
+# computes the indicators of a batch of (symbol, filtered Data Frame) pairs, runs in a worker process
+def compute_chunk(chunk):
+    return [(symbol, technical_analysis.calc_indicators(df)) for symbol, df in chunk]
+
+
+# splits the items into about `parts` lists of consecutive items
+def split(items, parts):
+    size = max(1, -(-len(items) // max(1, parts)))
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+# the row of one symbol in the screener: its indicators, the action each of them suggests and a summary
+# that counts the actions, the summary signal is whichever of Buy and Sell is suggested more often
+def screen_row(symbol, df, indicators):
+    actions = {}
+    for group in indicators.values():
+        for key, value in group.items():
+            actions[key] = technical_analysis.get_action(key, value, df)
+    counts = {signal: list(actions.values()).count(signal) for signal in SIGNALS}
+    signal = 'Hold'
+    if counts['Buy'] > counts['Sell']:
+        signal = 'Buy'
+    elif counts['Sell'] > counts['Buy']:
+        signal = 'Sell'
+    return {
+        'symbol': symbol,
+        'date': df['Date'].iloc[-1] if len(df) else None,
+        'price': float(df['Last_trade_price'].iloc[-1]) if len(df) else None,
+        'indicators': indicators,
+        'actions': actions,
+        'summary': {**counts, 'score': counts['Buy'] - counts['Sell'], 'signal': signal},
+    }
+
+
+# the value rows are sorted by: 'symbol', 'price', 'score' or the name of an indicator
+def sort_value(row, sort):
+    if sort == 'symbol':
+        return row['symbol']
+    if sort == 'price':
+        return row['price']
+    if sort == 'score':
+        return row['summary']['score']
+    for group in row['indicators'].values():
+        if sort in group:
+            return group[sort]
+    return None
+
+
+# sorts the rows, rows without a value always come last
+def sort_rows(rows, sort, descending=False):
+    present = [row for row in rows if sort_value(row, sort) is not None]
+    missing = [row for row in rows if sort_value(row, sort) is None]
+    return sorted(present, key=lambda row: sort_value(row, sort), reverse=descending) + missing
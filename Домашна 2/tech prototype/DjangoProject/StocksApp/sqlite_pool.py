@@ -0,0 +1,88 @@
+import asyncio
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+
+from StocksApp import metrics
+
+# applied to every pooled connection: reads map the file instead of copying pages through read(), each
+# connection keeps a 16MB page cache and query_only rejects any write that slips through
+READ_PRAGMAS = [
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-16384",
+    "PRAGMA query_only=1",
+]
+
+
+# read only connections to one database shared by the executor threads, at most `size` are ever opened
+# and a connection is handed to one thread at a time
+class ReadOnlyPool:
+    def __init__(self, db_path, size):
+        self.db_path = str(db_path)
+        self.size = size
+        self.idle = queue.LifoQueue()
+        self.opened = 0
+        self.lock = threading.Lock()
+
+    def open(self):
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+        for pragma in READ_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self.idle.get_nowait()
+        except queue.Empty:
+            with self.lock:
+                can_open = self.opened < self.size
+                if can_open:
+                    self.opened += 1
+            if can_open:
+                try:
+                    conn = self.open()
+                except BaseException:
+                    with self.lock:
+                        self.opened -= 1
+                    raise
+            else:
+                conn = self.idle.get()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self.idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+            with self.lock:
+                self.opened -= 1
+
+
+# the threads that the blocking work of the async views runs on, bounded so a burst of requests queues up instead
+# of starting a thread per request, with a pool of as many connections
+class Readers:
+    def __init__(self, db_path, workers):
+        self.pool = ReadOnlyPool(db_path, workers)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='stocks-reader')
+
+    # runs the function on the executor without blocking the event loop, counted for the current request
+    async def run(self, function, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self.executor,
+                                                                metrics.bind(partial(function, *args, **kwargs)))
+
+    # returns all rows of the query as (column names, rows), must be called on an executor thread
+    def query(self, sql, params=()):
+        metrics.count_query()
+        with self.pool.connection() as conn:
+            cursor = conn.execute(sql, params)
+            return [description[0] for description in cursor.description], cursor.fetchall()
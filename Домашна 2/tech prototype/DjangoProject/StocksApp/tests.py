@@ -1,3 +1,109 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from StocksApp import screening, views
+
+
+# the stock_data GET validators, run against the scraper's database the settings point to
+class StockDataConditionalGetTest(SimpleTestCase):
+    def setUp(self):
+        self.name = views.get_catalog().names[0]
+        self.url = f'/stock_data/{self.name}/'
+
+    def test_validators_are_sent(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_last_modified_is_not_modified(self):
+        last_modified = self.client.get(self.url)['Last-Modified']
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_other_query_has_other_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, {'format': 'columns'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_new_data_version_changes_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        views.indicators_cache.bump()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_unknown_symbol(self):
+        self.assertEqual(self.client.get('/stock_data/NO SUCH SYMBOL/').status_code, 404)
+
+
+class ScreenerTest(SimpleTestCase):
+    def setUp(self):
+        self.names = views.get_catalog().names[:3]
+
+    def test_indicator_names_follow_the_registry(self):
+        self.assertEqual(len(screening.INDICATOR_NAMES), 10)
+        self.assertIn('Relative Strength Index', screening.INDICATOR_NAMES)
+
+    def test_unknown_period(self):
+        response = self.client.get('/screener/', {'period': '3 years'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rows_of_the_symbols(self):
+        response = self.client.get('/screener/', {'symbols': ','.join(self.names), 'period': '1 year'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(row['symbol'] for row in response.json()['results']), sorted(self.names))
+
+    def test_all_time_is_not_shared_with_the_indicator_state(self):
+        views.indicators_cache.invalidate()
+        name = self.names[0]
+        last = views.get_catalog().info[name]['last']
+        self.client.get('/screener/', {'symbols': name, 'period': 'All time'})
+        self.assertIsNotNone(views.indicators_cache.get(name, 'All time', last))
+        self.assertIsNone(views.indicators_cache.get(name, 'All time', last, source='state'))
+
+    def test_limit_below_one(self):
+        for limit in ('0', '-1'):
+            response = self.client.get('/screener/', {'symbols': self.names[0], 'limit': limit})
+            self.assertEqual(response.status_code, 400)
+
+    def test_post_body_that_is_not_an_object(self):
+        for body in ([], ['1 year'], 1, 'All time', None):
+            response = self.client.post(f'/stock_data/{self.names[0]}/', json.dumps(body),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_unknown_time_period_in_post(self):
+        response = self.client.post(f'/stock_data/{self.names[0]}/', json.dumps({'timePeriod': '3 years'}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class MetricsTest(SimpleTestCase):
+    def test_prometheus_text(self):
+        response = self.client.get('/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn(b'stocks_price_store_bytes', response.content)
+
+    def test_only_get(self):
+        self.assertEqual(self.client.post('/metrics/').status_code, 405)
+
+    def test_stock_data_queries_are_counted(self):
+        name = views.get_catalog().names[0]
+        views.prices.invalidate(name)
+        self.client.get(f'/stock_data/{name}/')
+        lines = self.client.get('/metrics/').content.decode().splitlines()
+        counted = [line for line in lines if line.startswith('stocks_sql_queries_sum{view="stock_data"}')]
+        self.assertEqual(len(counted), 1)
+        self.assertGreater(float(counted[0].split()[-1]), 0)
@@ -1,95 +1,471 @@
 import ta
-from django.db import connections
-from django.http import JsonResponse
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from django.views.decorators.csrf import csrf_exempt
+from StocksApp import catalog, metrics, screening, sqlite_pool
+from StocksApp.library import import_library
+import asyncio
+import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
 import json
-import sys
-import os
+import sqlite3
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
-original_sys_path = sys.path.copy()
-sys.path = [path for path in sys.path if 'site-packages' not in path]
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../../Домашна 3/src')))
-sys.path.append(os.path.join(os.path.dirname(sys.executable), 'Lib', 'site-packages'))
-import technical_analysis
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-sys.path = original_sys_path
+technical_analysis, price_store, downsampling, indicator_cache, indicator_state, price_bars = import_library(
+    'technical_analysis', 'price_store', 'downsampling', 'indicator_cache', 'indicator_state', 'price_bars')
 
+indicators_cache = indicator_cache.IndicatorCache(settings.INDICATOR_CACHE_SIZE, str(settings.EXTERNAL_DATA_VERSION_FILE))
+indicator_states = indicator_state.StateStore(settings.INDICATOR_STATE_DB)
+# database reads, pandas and the indicator math of the async views run on these threads
+readers = sqlite_pool.Readers(settings.DATABASES['external']['NAME'], settings.STOCK_READERS)
+# every symbol's rows as sorted arrays, shared by the threads of this process and refreshed when the scraper writes.
+# Its queries go through the readers' pool like the views' own
+prices = price_store.shared(settings.DATABASES['external']['NAME'], settings.EXTERNAL_SNAPSHOT_DIR,
+                            settings.PRICE_STORE_BYTES, readers.query)
 
-def get_table_names(limit=None):
-    connection = connections['external']
-    cursor = connection.cursor()
-    query = "SELECT name FROM sqlite_master WHERE type='table'"
-    if limit is not None:
-        query += f" LIMIT {limit}"
+
+def get_catalog():
+    return catalog.current(settings.DATABASES['external']['NAME'])
+
+
+# lists of the homepage read from the market_summary table the scraper keeps, name -> ORDER BY clause.
+# Only symbols that traded in the week up to the latest trading day take part
+MARKET_LISTS = {
+    'gainers': 'Change DESC',
+    'losers': 'Change ASC',
+    'most_traded': 'Turnover DESC',
+}
+SUMMARY_COLUMNS = ['Code', 'Date', 'Price', 'Change', 'Volume', 'Turnover', 'High_52w', 'Low_52w']
+
+
+# returns {list name: [summary rows]} with one query over the indexes of market_summary, or None for a
+# database written before the summary existed. Runs on a reader thread
+def market_lists(limit):
+    recent = (f"FROM market_summary WHERE Date >= date((SELECT MAX(Date) FROM market_summary), '-7 days') "
+              f"AND {{column}} IS NOT NULL ORDER BY {{order}} LIMIT {int(limit)}")
+    parts = [f"SELECT * FROM (SELECT '{name}', {', '.join(SUMMARY_COLUMNS)} "
+             f"{recent.format(column=order.split()[0], order=order)})"
+             for name, order in MARKET_LISTS.items()]
     try:
-        cursor.execute(query)
-        table_names = cursor.fetchall()
-    finally:
-        cursor.close()
-    return [table[0] for table in table_names]
+        _, rows = readers.query(' UNION ALL '.join(parts))
+    except sqlite3.OperationalError:
+        return None
+    lists = {name: [] for name in MARKET_LISTS}
+    for row in rows:
+        lists[row[0]].append(dict(zip(SUMMARY_COLUMNS, row[1:])))
+    return lists
 
 
 @csrf_exempt
-def homepage(request):
+async def homepage(request):
     if request.method != "GET":
         return JsonResponse({"error": "Only get method is allowed"}, status=405)
-    front_page = get_table_names(8)
-    return JsonResponse({"front_page": front_page}, status=200)
+    symbols = await readers.run(get_catalog)
+    lists = await readers.run(market_lists, 8)
+    if lists and lists['most_traded']:
+        front_page = [row['Code'] for row in lists['most_traded']]
+    else:
+        front_page = symbols.names[:8]
+    return JsonResponse({"front_page": front_page, "info": {name: symbols.info[name] for name in front_page},
+                         **(lists or {})}, status=200)
 
 
 @csrf_exempt
-def search(request):
+async def search(request):
     if request.method != "POST":
         return JsonResponse({"error": "Only POST method is allowed"}, status=405)
 
     try:
         body = json.loads(request.body)
         text = body.get('search')
-        if not text:
+        if not text or not isinstance(text, str):
             return JsonResponse({"error": "Search term is required"}, status=400)
     except json.JSONDecodeError:
         return JsonResponse({"error": "Invalid JSON"}, status=400)
-    table_names = get_table_names()
-    names = []
-    for name in table_names:
-        if text in name:
-            names.append(name)
-        if text == '!all':
-            names.append(name)
-    return JsonResponse({"names": names}, status=200)
-
-
-def get_stock_data(name):
-    connection = connections['external']
-    cursor = connection.cursor()
-    try:
-        cursor.execute(f"SELECT Date, Last_trade_price, Max, Min FROM {name}")
-        column_names = [description[0] for description in cursor.description]
-        rows = cursor.fetchall()
-    finally:
-        cursor.close()
-    df = pd.DataFrame(rows, columns=column_names)
-    # reverse the order of the data
-    df = df.iloc[::-1].reset_index(drop=True)
-    return df
+    symbols = await readers.run(get_catalog)
+    names = symbols.names if text == '!all' else symbols.search(text)
+    return JsonResponse({"names": names, "info": {name: symbols.info[name] for name in names}}, status=200)
+
+
+# columns of a symbol that GET stock_data may return, selected with ?fields=Last_trade_price,Volume
+STOCK_FIELDS = ['Last_trade_price', 'Max', 'Min', 'Avg_Price', 'chg', 'Volume', 'Turnover_in_BEST_in_denars',
+                'Total_turnover_in_denars']
+# bars the chart and the indicators can be built from, ?interval=week in GET and "interval" in POST stock_data.
+# A weekly or monthly bar has the daily column names for its close, high, low, volume and turnover
+INTERVALS = ['day'] + list(price_bars.INTERVALS)
+BAR_FIELDS = ['Open', 'Last_trade_price', 'Max', 'Min', 'Volume', 'Total_turnover_in_denars', 'Days']
+
+
+def get_stock_data(name, columns=('Last_trade_price', 'Max', 'Min'), date_from=None, date_to=None, interval='day'):
+    with metrics.phase('db'):
+        return read_stock_data(name, list(columns), date_from, date_to, interval)
+
+
+def read_stock_data(name, columns, date_from, date_to, interval='day'):
+    if interval != 'day':
+        return prices.frame(name, columns, date_from, date_to, interval=interval)
+    if set(columns) <= set(price_store.COLUMNS):
+        return prices.frame(name, columns, date_from, date_to)
+    conditions = []
+    params = []
+    if date_from is not None:
+        conditions.append("Date >= ?")
+        params.append(date_from)
+    if date_to is not None:
+        conditions.append("Date <= ?")
+        params.append(date_to)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    column_names, rows = readers.query(f'SELECT Date, {", ".join(columns)} FROM "{name}"{where} ORDER BY Date', params)
+    return pd.DataFrame(rows, columns=column_names)
+
+
+# accepts YYYY-MM-DD and the dd.mm.YYYY dates the frontend shows, returns YYYY-MM-DD or raises ValueError
+def parse_date(value):
+    for date_format in ("%Y-%m-%d", "%d.%m.%Y"):
+        try:
+            return datetime.strptime(value, date_format).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date: {value}")
+
+
+# reads the from, to, points, fields and interval query parameters of GET stock_data, raises ValueError on
+# bad ones
+def parse_range_query(query):
+    date_from = parse_date(query['from']) if query.get('from') else None
+    date_to = parse_date(query['to']) if query.get('to') else None
+    points = None
+    if query.get('points'):
+        points = int(query['points'])
+        if points < 3:
+            raise ValueError("points must be at least 3")
+    interval = query.get('interval') or 'day'
+    if interval not in INTERVALS:
+        raise ValueError(f"interval must be one of {', '.join(INTERVALS)}")
+    fields = ['Last_trade_price']
+    if query.get('fields'):
+        fields = [field for field in query['fields'].split(',') if field]
+        unknown = [field for field in fields if field not in (STOCK_FIELDS if interval == 'day' else BAR_FIELDS)]
+        if unknown or not fields:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return date_from, date_to, points, fields, interval
+
+
+# serializes the frame as parallel arrays, {"columns": {"Date": [...], "Last_trade_price": [...]}, ...}.
+# orjson writes the float arrays straight from numpy, missing values become null with either encoder
+def columnar_json(df, **extra):
+    if orjson is not None:
+        columns = {column: df[column].tolist() if column == 'Date' else df[column].to_numpy(dtype=np.float64)
+                   for column in df.columns}
+        return orjson.dumps({'columns': columns, **extra}, option=orjson.OPT_SERIALIZE_NUMPY)
+    columns = {column: df[column].astype(object).where(df[column].notna(), None).tolist() for column in df.columns}
+    return json.dumps({'columns': columns, **extra}, separators=(',', ':')).encode()
+
+
+# the ETag and Last-Modified (epoch seconds) of a GET stock_data response. The ETag changes with the row count
+# and last stored date of the symbol in the symbol catalog, which is reloaded whenever the database changes,
+# and with the scraper's data version, which is bumped after rows were updated in place. Runs on a reader thread
+def stock_validators(name, query):
+    info = get_catalog().info.get(name)
+    if info is None:
+        return None, None
+    key = f"{name}|{info['rows']}|{info['last']}|{indicators_cache.version()}|{query}"
+    etag = hashlib.sha1(key.encode()).hexdigest()[:20]
+    last_modified = None
+    if info['last'] is not None:
+        last_modified = int(datetime.strptime(info['last'], "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp())
+    return etag, last_modified
+
+
+# builds the body of a GET stock_data response, runs on a reader thread. Weekly and monthly bars are dated
+# by the first day of their period
+def stock_data_body(name, fields, date_from, date_to, points, columnar, interval='day'):
+    df = get_stock_data(name, fields, date_from, date_to, interval)
+    rows = len(df)
+    if points is not None and rows > points:
+        with metrics.phase('analysis'):
+            # keeps the points that preserve the shape of the first requested field
+            days = df['Date'].to_numpy(dtype='datetime64[D]').astype('int64')
+            df = df.iloc[downsampling.lttb(days, df[fields[0]].to_numpy(dtype='float64'), points)].reset_index(drop=True)
+    with metrics.phase('serialization'):
+        # dates are stored as YYYY-MM-DD, the frontend expects dd.mm.YYYY
+        df['Date'] = df['Date'].str[8:10] + '.' + df['Date'].str[5:7] + '.' + df['Date'].str[0:4]
+        if columnar:
+            return columnar_json(df, rows=rows)
+        return json.dumps({'data': df.to_dict(orient='records'), 'rows': rows}, cls=DjangoJSONEncoder).encode()
+
+
+# returns the indicators of the time period from the cache or computes them, runs on a reader thread.
+# Weekly and monthly indicators are computed over the precomputed bars of the period
+def get_indicators(name, time_period, last_date, interval='day'):
+    def compute():
+        if interval != 'day':
+            with metrics.phase('db'):
+                bars = prices.bars(name, interval, technical_analysis.period_start(time_period))
+            with metrics.phase('analysis'):
+                return technical_analysis.calc_indicators(bars)
+        if time_period == 'All time':
+            # the stored state of the symbol only has to read and step through the rows added since
+            metrics.count_query()
+            with readers.pool.connection() as conn, metrics.phase('analysis'):
+                return indicator_state.catch_up(indicator_states, name, conn).values()
+        with metrics.phase('db'):
+            window = prices.window(name, technical_analysis.period_start(time_period))
+        with metrics.phase('analysis'):
+            return technical_analysis.calc_indicators(window)
+
+    # 'All time' daily indicators come from the indicator state, the screener's from calc_indicators
+    source = 'state' if interval == 'day' and time_period == 'All time' else 'window'
+    return indicators_cache.get_or_compute(name, time_period, last_date, compute, interval, source)
 
 
 @csrf_exempt
-def stock_data(request, name):
-    df = get_stock_data(name)
+async def stock_data(request, name):
+    symbols = await readers.run(get_catalog)
+    if name not in symbols:
+        return JsonResponse({'error': f'Unknown stock {name}'}, status=404)
+
     if request.method == 'GET':
-        df.drop(columns=['Max', 'Min'], inplace=True)
-        response_data = {'data': df.to_dict(orient='records')}
-        return JsonResponse(response_data, status=200)
+        try:
+            date_from, date_to, points, fields, interval = parse_range_query(request.GET)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        etag, last_modified = await readers.run(stock_validators, name, request.GET.urlencode())
+        response = HttpResponse(content_type='application/json')
+        if etag is not None:
+            response['ETag'] = quote_etag(etag)
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # cached copies are revalidated with If-None-Match / If-Modified-Since and answered with 304
+        patch_cache_control(response, no_cache=True)
+        conditional = get_conditional_response(request, quote_etag(etag) if etag else None, last_modified, response)
+        if conditional is not response:
+            return conditional
+        response.content = await readers.run(stock_data_body, name, fields, date_from, date_to, points,
+                                             request.GET.get('format') == 'columns', interval)
+        return response
 
     if request.method == 'POST':
         try:
-            time_period = json.loads(request.body).get('timePeriod')
+            payload = json.loads(request.body)
         except json.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
-        df = technical_analysis.filter_data(df, time_period)
-        indicators = technical_analysis.calc_indicators(df)
+        if not isinstance(payload, dict):
+            return JsonResponse({'error': 'Expected a JSON object'}, status=400)
+        time_period = payload.get('timePeriod') or 'All time'
+        if time_period not in technical_analysis.TIME_PERIODS:
+            return JsonResponse({'error': f"timePeriod must be one of {', '.join(technical_analysis.TIME_PERIODS)}"},
+                                status=400)
+        interval = payload.get('interval') or 'day'
+        if interval not in INTERVALS:
+            return JsonResponse({'error': f"interval must be one of {', '.join(INTERVALS)}"}, status=400)
+        indicators = await readers.run(get_indicators, name, time_period, symbols.info[name]['last'], interval)
         response_data = {'indicators': indicators}
-        return JsonResponse(response_data, status=200)
+        with metrics.phase('serialization'):
+            return JsonResponse(response_data, status=200)
+
+
+screener_pool = None
+screener_pool_lock = threading.Lock()
+
+
+def get_screener_pool():
+    global screener_pool
+    with screener_pool_lock:
+        if screener_pool is None:
+            # spawned, as forking would copy the reader threads' locks and connections into the workers
+            screener_pool = ProcessPoolExecutor(max_workers=settings.SCREENER_PROCESSES,
+                                                mp_context=multiprocessing.get_context('spawn'))
+    return screener_pool
+
+
+# computes the indicators of (symbol, Data Frame) pairs, split in chunks over the screener processes
+def compute_indicators(pending):
+    if settings.SCREENER_PROCESSES <= 1 or len(pending) <= 1:
+        return screening.compute_chunk(pending)
+    chunks = screening.split(pending, settings.SCREENER_PROCESSES * 4)
+    return [item for chunk in get_screener_pool().map(screening.compute_chunk, chunks) for item in chunk]
+
+
+# the screener rows of the symbols in one pass: every symbol is read once, indicators found in the
+# indicator cache are reused and the rest are computed in parallel and cached. Runs on a reader thread
+def screener_rows(names, time_period):
+    symbols = get_catalog()
+    frames = {}
+    found = {}
+    pending = []
+    for name in names:
+        df = get_stock_data(name, date_from=technical_analysis.period_start(time_period))
+        frames[name] = df
+        indicators = indicators_cache.get(name, time_period, symbols.info[name]['last'])
+        if indicators is None:
+            pending.append((name, df))
+        else:
+            found[name] = indicators
+    with metrics.phase('analysis'):
+        for name, indicators in compute_indicators(pending):
+            indicators_cache.put(name, time_period, symbols.info[name]['last'], indicators)
+            found[name] = indicators
+        return [screening.screen_row(name, frames[name], found[name]) for name in names]
+
+
+# GET screener/ returns indicators and actions of every symbol, parameters:
+#   symbols=ALK,KMB or search=AL    only these symbols
+#   period=1 year                   time period as in POST stock_data, default 5 years
+#   signal=Buy [&indicator=Trix]    only symbols whose summary signal, or the action of that indicator, matches
+#   sort=score|symbol|price|<indicator> [&order=desc] [&limit=10]
+@csrf_exempt
+async def screener(request):
+    if request.method != "GET":
+        return JsonResponse({"error": "Only get method is allowed"}, status=405)
+    query = request.GET
+    time_period = query.get('period', '5 years')
+    signal = query.get('signal')
+    indicator = query.get('indicator')
+    sort = query.get('sort', 'symbol')
+    order = query.get('order', 'asc')
+    if time_period not in technical_analysis.TIME_PERIODS:
+        return JsonResponse({"error": f"period must be one of {', '.join(technical_analysis.TIME_PERIODS)}"},
+                            status=400)
+    if signal is not None and signal not in screening.SIGNALS:
+        return JsonResponse({"error": f"signal must be one of {', '.join(screening.SIGNALS)}"}, status=400)
+    if indicator is not None and indicator not in screening.INDICATOR_NAMES:
+        return JsonResponse({"error": f"Unknown indicator {indicator}"}, status=400)
+    if sort not in screening.SORT_KEYS + screening.INDICATOR_NAMES:
+        return JsonResponse({"error": f"Unknown sort key {sort}"}, status=400)
+    if order not in ('asc', 'desc'):
+        return JsonResponse({"error": "order must be asc or desc"}, status=400)
+    try:
+        limit = int(query['limit']) if query.get('limit') else None
+    except ValueError:
+        return JsonResponse({"error": "limit must be a number"}, status=400)
+    if limit is not None and limit < 1:
+        return JsonResponse({"error": "limit must be at least 1"}, status=400)
+
+    symbols = await readers.run(get_catalog)
+    names = symbols.names
+    if query.get('symbols'):
+        names = [name for name in query['symbols'].split(',') if name]
+        unknown = [name for name in names if name not in symbols]
+        if unknown:
+            return JsonResponse({"error": f"Unknown stocks {', '.join(unknown)}"}, status=400)
+    elif query.get('search'):
+        names = symbols.search(query['search'])
+
+    rows = await readers.run(screener_rows, names, time_period)
+    if signal is not None:
+        if indicator is not None:
+            rows = [row for row in rows if row['actions'][indicator] == signal]
+        else:
+            rows = [row for row in rows if row['summary']['signal'] == signal]
+    rows = screening.sort_rows(rows, sort, order == 'desc')[:limit]
+    with metrics.phase('serialization'):
+        return JsonResponse({"period": time_period, "count": len(rows), "results": rows}, status=200)
+
+
+# formats one Server-Sent Event, the data is a single line of JSON
+def sse_event(event, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, cls=DjangoJSONEncoder)}")
+    return "\n".join(lines) + "\n\n"
+
+
+# the bars of the symbol stored after the YYYY-MM-DD date as parallel arrays with dd.mm.YYYY dates, and the
+# date of the last one. Runs on a reader thread
+def bars_after(name, after):
+    date_from = (datetime.strptime(after, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+    df = get_stock_data(name, date_from=date_from)
+    if len(df) == 0:
+        return None, after
+    last = df['Date'].iloc[-1]
+    df['Date'] = df['Date'].str[8:10] + '.' + df['Date'].str[5:7] + '.' + df['Date'].str[0:4]
+    columns = {column: df[column].astype(object).where(df[column].notna(), None).tolist() for column in df.columns}
+    return columns, last
+
+
+# pushes "bars" events with the rows stored after the last one the client has, and an "indicators" event
+# whenever the indicators of the time period change. The event id is the date of the last bar sent, so a
+# reconnecting EventSource resumes through Last-Event-ID
+async def price_events(name, since, time_period):
+    yield f"retry: {settings.STREAM_RETRY_MS}\n\n"
+    last_sent = since
+    last_indicators = None
+    while True:
+        info = (await readers.run(get_catalog)).info.get(name)
+        if info is None:
+            yield sse_event('error', {'error': f'Unknown stock {name}'})
+            return
+        if last_sent is None:
+            last_sent = info['last']
+        sent = False
+        if info['last'] is not None and last_sent is not None and info['last'] > last_sent:
+            bars, last = await readers.run(bars_after, name, last_sent)
+            if bars is not None:
+                yield sse_event('bars', bars, last)
+                sent = True
+            last_sent = last
+        indicators = await readers.run(get_indicators, name, time_period, info['last'])
+        if indicators != last_indicators:
+            yield sse_event('indicators', {'timePeriod': time_period, 'indicators': indicators}, last_sent)
+            last_indicators = indicators
+            sent = True
+        if not sent:
+            # keeps proxies from closing the idle connection
+            yield ": keepalive\n\n"
+        await asyncio.sleep(settings.STREAM_POLL_SECONDS)
+
+
+# GET stream/<name>/?period=1 year&since=YYYY-MM-DD is a Server-Sent Events stream of new bars and updated
+# indicators of the symbol. Without since it starts from the latest stored bar
+@csrf_exempt
+async def stream(request, name):
+    if request.method != "GET":
+        return JsonResponse({"error": "Only get method is allowed"}, status=405)
+    symbols = await readers.run(get_catalog)
+    if name not in symbols:
+        return JsonResponse({'error': f'Unknown stock {name}'}, status=404)
+    since = request.headers.get('Last-Event-ID') or request.GET.get('since')
+    try:
+        since = parse_date(since) if since else None
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    time_period = request.GET.get('period', '5 years')
+    if time_period not in technical_analysis.TIME_PERIODS:
+        return JsonResponse({"error": f"period must be one of {', '.join(technical_analysis.TIME_PERIODS)}"},
+                            status=400)
+    response = StreamingHttpResponse(price_events(name, since, time_period), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# GET metrics/ is the request metrics of this process in the Prometheus text format
+def metrics_view(request):
+    if request.method != "GET":
+        return JsonResponse({"error": "Only get method is allowed"}, status=405)
+    cache_stats = indicators_cache.stats()
+    price_stats = prices.stats()
+    extra = [
+        ('stocks_indicator_cache_hits', 'Indicator cache hits.', cache_stats['hits']),
+        ('stocks_indicator_cache_misses', 'Indicator cache misses.', cache_stats['misses']),
+        ('stocks_indicator_cache_size', 'Results in the indicator cache.', cache_stats['size']),
+        ('stocks_price_store_symbols', 'Symbols held by the price store.', price_stats['size']),
+        ('stocks_price_store_bytes', 'Bytes of arrays held by the price store.', price_stats['bytes']),
+        ('stocks_price_store_evictions', 'Symbols the price store dropped to stay within its budget.',
+         price_stats['evictions']),
+        ('stocks_reader_connections', 'Open read only connections to the external database.', readers.pool.opened),
+    ]
+    return HttpResponse(metrics.registry.render(extra), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,156 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+SCRAPER_DIR = os.path.abspath(os.path.join(PROJECT_DIR, '../../../Домашна 1'))
+TIME_PERIODS = ['All time', '5 years', '1 year', '1 month', '1 week', '1 day']
+
+
+# writes a database of `symbols` synthetic codes with `years` of daily history each, in the per code table
+# layout the scraper writes (or the long one), and optionally the snapshot the scraper publishes with it
+def build_database(directory, symbols, years, layout='tables', with_snapshot=False):
+    sys.path.insert(0, os.path.join(SCRAPER_DIR, 'benchmarks'))
+    sys.path.insert(0, os.path.join(SCRAPER_DIR, 'src'))
+    import snapshot
+    import storage
+    import synthetic
+
+    db_file_path = os.path.join(directory, 'database.sqlite')
+    storage.migrate(db_file_path)
+    if layout == storage.LAYOUT_LONG:
+        storage.migrate_to_long(db_file_path)
+    data = {}
+    for code in synthetic.make_codes(symbols):
+        df = synthetic.make_history(code, years)
+        df['Date'] = df['Date'].dt.strftime(storage.DATE_FORMAT)
+        data[code] = df
+    storage.save(data, db_file_path)
+    if with_snapshot:
+        snapshot.export(db_file_path, os.path.join(directory, 'snapshot'))
+    return db_file_path, sum(len(df) for df in data.values())
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+# the requests of every scenario, a request is (method, path, json body or None)
+def scenarios(names, rng, count):
+    result = {
+        'homepage': [('GET', '/homepage/', None)] * count,
+        'search': [('POST', '/search/', {'search': rng.choice(names)[:rng.randint(1, 3)]}) for _ in range(count)],
+        'stock_data GET': [('GET', f'/stock_data/{rng.choice(names)}/', None) for _ in range(count)],
+    }
+    for time_period in TIME_PERIODS:
+        result[f'stock_data POST {time_period}'] = [
+            ('POST', f'/stock_data/{rng.choice(names)}/', {'timePeriod': time_period}) for _ in range(count)]
+    # the same long range over weekly bars, which the scraper precomputes
+    result['stock_data POST 5 years weekly'] = [
+        ('POST', f'/stock_data/{rng.choice(names)}/', {'timePeriod': '5 years', 'interval': 'week'})
+        for _ in range(count)]
+    return result
+
+
+# sends the requests through the ASGI stack with at most `concurrency` in flight, returns the report
+async def drive(client, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def send(method, path, body):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            if method == 'GET':
+                response = await client.get(path)
+            else:
+                response = await client.post(path, json.dumps(body), content_type='application/json')
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[send(*request) for request in requests])
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': len(requests),
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(requests) / elapsed, 1) if elapsed > 0 else None,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(max(latencies) * 1000, 2),
+    }
+
+
+def run(symbols, years, requests, concurrency, layout='tables', with_snapshot=False, indicator_cache=True,
+        seed=0):
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        db_file_path, rows = build_database(directory, symbols, years, layout, with_snapshot)
+        build_seconds = time.perf_counter() - started
+
+        os.environ['STOCKS_EXTERNAL_DB'] = db_file_path
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DjangoProject.settings')
+        sys.path.insert(0, PROJECT_DIR)
+        import django
+        django.setup()
+        from django.conf import settings
+        from django.test import AsyncClient
+        settings.DEBUG = False
+        settings.METRICS_SLOW_REQUEST_SECONDS = None
+        if not indicator_cache:
+            settings.INDICATOR_CACHE_SIZE = 0
+        from StocksApp import views
+
+        names = views.get_catalog().names
+        client = AsyncClient()
+        results = {}
+        for name, scenario in scenarios(names, random.Random(seed), requests).items():
+            results[name] = asyncio.run(drive(client, scenario, concurrency))
+            print(f"{name:30} {results[name]['requests_per_second']:>8} req/s  p50 {results[name]['p50_ms']:>8}ms  "
+                  f"p95 {results[name]['p95_ms']:>8}ms  p99 {results[name]['p99_ms']:>8}ms  "
+                  f"errors {results[name]['errors']}")
+        views.readers.executor.shutdown()
+
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'config': {'symbols': symbols, 'years': years, 'rows': rows, 'requests': requests,
+                   'concurrency': concurrency, 'layout': layout, 'snapshot': with_snapshot,
+                   'indicator_cache': indicator_cache, 'seed': seed},
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpus': os.cpu_count()},
+        'build_seconds': round(build_seconds, 2),
+        'results': results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load tests the StocksApp views on a synthetic database")
+    parser.add_argument('--symbols', type=int, default=110)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=200, help="requests per scenario")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--layout', choices=['tables', 'long'], default='tables')
+    parser.add_argument('--snapshot', action='store_true', help="also export the columnar snapshot")
+    parser.add_argument('--no-indicator-cache', action='store_true', help="compute indicators on every POST")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="write the results to this file")
+    args = parser.parse_args()
+    report = run(args.symbols, args.years, args.requests, args.concurrency, args.layout, args.snapshot,
+                 not args.no_indicator_cache, args.seed)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
@@ -1,4 +1,4 @@
-import React, {useEffect, useState} from 'react';
+import React, {useEffect, useRef, useState} from 'react';
 import {useParams} from 'react-router-dom';
 import axios from 'axios';
 import {Line} from 'react-chartjs-2';
@@ -15,63 +15,77 @@ import {
 
 ChartJS.register(CategoryScale, LinearScale, LineElement, PointElement, Title, Tooltip, Legend);
 
+// the first day of the time period as YYYY-MM-DD, null for all time
+const periodStart = (timePeriod) => {
+    const now = new Date();
+    let cutoffDate;
+
+    switch (timePeriod) {
+        case '5 years':
+            cutoffDate = new Date(now.getFullYear() - 5, now.getMonth(), now.getDate());
+            break;
+        case '1 year':
+            cutoffDate = new Date(now.getFullYear() - 1, now.getMonth(), now.getDate());
+            break;
+        case '1 month':
+            cutoffDate = new Date(now.getFullYear(), now.getMonth() - 1, now.getDate());
+            break;
+        case '1 week':
+            cutoffDate = new Date(now.getFullYear(), now.getMonth(), now.getDate() - 7);
+            break;
+        case '1 day':
+            cutoffDate = new Date(now.getFullYear(), now.getMonth(), now.getDate() - 1);
+            break;
+        default:
+            return null;
+    }
+    const pad = (value) => String(value).padStart(2, '0');
+    return `${cutoffDate.getFullYear()}-${pad(cutoffDate.getMonth() + 1)}-${pad(cutoffDate.getDate())}`;
+};
+
 const StockDetails = () => {
     const {name} = useParams();
     const [data, setData] = useState(null);
     const [loading, setLoading] = useState(true);
     const [timePeriod, setTimePeriod] = useState('5 years');
-    const [graphData, setGraphData] = useState([]);
     const [indicators, setIndicators] = useState([]);
+    const [chartWidth, setChartWidth] = useState(0);
+    const chartContainer = useRef(null);
     const timePeriods = ['All time', '5 years', '1 year', '1 month', '1 week', '1 day'];
 
     useEffect(() => {
+        const measure = () => setChartWidth(chartContainer.current ? chartContainer.current.clientWidth : 0);
+        measure();
+        window.addEventListener('resize', measure);
+        return () => window.removeEventListener('resize', measure);
+    }, []);
+
+    // the chart asks for as many points as it is wide, the server downsamples the period to them with LTTB
+    useEffect(() => {
+        if (!chartWidth) return;
+        let ignore = false;
         const fetchStockDetails = async () => {
             try {
                 const backendUrl = `http://localhost:8000/stock_data/${name}/`;
-                const response = await axios.get(backendUrl);
+                const params = {points: chartWidth};
+                const from = periodStart(timePeriod);
+                if (from) {
+                    params.from = from;
+                }
+                const response = await axios.get(backendUrl, {params});
 
-                setData(response.data.data);
+                if (!ignore) setData(response.data.data);
             } catch (error) {
                 console.error("Error fetching stock details:", error);
             } finally {
-                setLoading(false);
+                if (!ignore) setLoading(false);
             }
         };
         fetchStockDetails();
-    }, [name]);
-
-    useEffect(() => {
-        if (!data) return;
-
-        const now = new Date();
-        let cutoffDate;
-
-        switch (timePeriod) {
-            case '5 years':
-                cutoffDate = new Date(now.getFullYear() - 5, now.getMonth(), now.getDate());
-                break;
-            case '1 year':
-                cutoffDate = new Date(now.getFullYear() - 1, now.getMonth(), now.getDate());
-                break;
-            case '1 month':
-                cutoffDate = new Date(now.getFullYear(), now.getMonth() - 1, now.getDate());
-                break;
-            case '1 week':
-                cutoffDate = new Date(now.getFullYear(), now.getMonth(), now.getDate() - 7);
-                break;
-            case '1 day':
-                cutoffDate = new Date(now.getFullYear(), now.getMonth(), now.getDate() - 1);
-                break;
-            default:
-                cutoffDate = null;
-        }
-
-        const dataToGraph = cutoffDate
-            ? data.filter(item => new Date(item.Date.split('.').reverse().join('-')) >= cutoffDate)
-            : data;
-
-        setGraphData(dataToGraph);
-    }, [timePeriod, data]);
+        return () => {
+            ignore = true;
+        };
+    }, [name, timePeriod, chartWidth]);
 
     useEffect(() => {
         const fetchIndicators = async () => {
@@ -94,13 +108,34 @@ const StockDetails = () => {
         fetchIndicators();
     }, [timePeriod]);
 
+    useEffect(() => {
+        if (loading || !data) return;
+        const params = new URLSearchParams({period: timePeriod});
+        if (data.length > 0) {
+            params.set('since', data[data.length - 1].Date);
+        }
+        const source = new EventSource(`http://localhost:8000/stream/${name}/?${params}`);
+        source.addEventListener('bars', (event) => {
+            const bars = JSON.parse(event.data);
+            const rows = bars.Date.map((date, index) => ({
+                Date: date,
+                Last_trade_price: bars.Last_trade_price[index]
+            }));
+            setData(previous => [...previous, ...rows]);
+        });
+        source.addEventListener('indicators', (event) => {
+            setIndicators(JSON.parse(event.data).indicators);
+        });
+        return () => source.close();
+        // the stream resumes from the last bar when it is reopened, new bars must not reopen it
+        // eslint-disable-next-line react-hooks/exhaustive-deps
+    }, [name, timePeriod, loading]);
+
     const handleClick = (label) => {
         setTimePeriod(label);
     };
 
-    if (loading) return <p>Loading...</p>;
-
-    if (!data) return <p>Error: No data available.</p>;
+    const graphData = data || [];
 
     const chartData = {
         labels: graphData.map(item => item.Date),
@@ -198,8 +233,10 @@ const StockDetails = () => {
                 </div>
             </div>
             <div style={{marginTop: '20px', display: 'flex', justifyContent: 'space-between'}}>
-                <div style={{flex: 1}}>
-                    <Line data={chartData} options={chartOptions}/>
+                <div style={{flex: 1}} ref={chartContainer}>
+                    {loading ? <p>Loading...</p>
+                        : data ? <Line data={chartData} options={chartOptions}/>
+                            : <p>Error: No data available.</p>}
                 </div>
 
                 <div style={{flex: 1, marginLeft: '20px'}}>
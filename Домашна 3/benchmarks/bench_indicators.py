@@ -0,0 +1,120 @@
+import argparse
+import os
+import sqlite3
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src import technical_analysis
+
+TIME_PERIODS = ['1 year', '5 years', 'All time']
+
+
+# the Date, Last_trade_price, Max and Min history of every symbol of the database, oldest day first
+def load_database(db_path, limit=None):
+    conn = sqlite3.connect(db_path)
+    try:
+        query = ("SELECT name FROM sqlite_master WHERE type IN ('table', 'view') "
+                 "AND name NOT LIKE 'sqlite_%' AND name NOT IN ('prices', 'market_summary', 'bars')")
+        names = [name for name, in conn.execute(query)]
+        data = {}
+        for name in names[:limit]:
+            try:
+                df = pd.read_sql_query(f'SELECT Date, Last_trade_price, Max, Min FROM "{name}" ORDER BY Date', conn)
+            except Exception:
+                continue
+            if len(df):
+                data[name] = df
+    finally:
+        conn.close()
+    return data
+
+
+# random walk histories from the scraper's synthetic data, oldest day first
+def load_synthetic(codes, years):
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../Домашна 1/benchmarks')))
+    import synthetic
+
+    data = {}
+    for code in synthetic.make_codes(codes):
+        df = synthetic.make_history(code, years).iloc[::-1].reset_index(drop=True)
+        df['Date'] = df['Date'].dt.strftime('%Y-%m-%d')
+        data[code] = df.rename(columns={'Last trade price': 'Last_trade_price'})[['Date', 'Last_trade_price', 'Max', 'Min']]
+    return data
+
+
+# whether the latest Stochastic RSI %D is built from a window of 14 equal RSI values, which needs 14 equal
+# prices among the last 18. The range of such a window is only the rounding noise of ta's moving averages,
+# so ta reports noise where the engine keeps the previous value
+def flat_rsi_window(df, window=14, rows=18):
+    run = longest = 1
+    prices = df['Last_trade_price'].tail(rows).tolist()
+    for previous, price in zip(prices, prices[1:]):
+        run = run + 1 if price == previous else 1
+        longest = max(longest, run)
+    return longest >= window
+
+
+# the indicators whose values differ by more than the tolerance
+def mismatches(df, expected, actual, tolerance):
+    flat = flat_rsi_window(df)
+    result = []
+    for group, values in expected.items():
+        for key, value in values.items():
+            other = actual[group][key]
+            if value is None or other is None:
+                if value is not other:
+                    result.append(key)
+            elif abs(value - other) > tolerance and not (flat and key == 'Stochastic RSI %D'):
+                result.append(key)
+    return result
+
+
+def timed(function, frames):
+    started = time.perf_counter()
+    results = [function(df) for df in frames]
+    return time.perf_counter() - started, results
+
+
+# times both paths for every time period, checks that they agree and prints one line per period
+def run(data, tolerance):
+    report = {}
+    for time_period in TIME_PERIODS:
+        frames = [technical_analysis.filter_data(df, time_period) for df in data.values()]
+        frames = [df for df in frames if len(df)]
+        rows = sum(len(df) for df in frames)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            strategy_seconds, expected = timed(technical_analysis.strategy_indicators, frames)
+        engine_seconds, actual = timed(technical_analysis.calc_indicators, frames)
+        differing = {}
+        for df, left, right in zip(frames, expected, actual):
+            for key in mismatches(df, left, right, tolerance):
+                differing[key] = differing.get(key, 0) + 1
+        report[time_period] = {'symbols': len(frames), 'rows': rows, 'strategy_seconds': strategy_seconds,
+                               'engine_seconds': engine_seconds, 'mismatches': differing}
+        print(f"{time_period:9} {len(frames):4} symbols {rows:8} rows  strategies {strategy_seconds * 1000:9.1f}ms  "
+              f"engine {engine_seconds * 1000:8.1f}ms  x{strategy_seconds / engine_seconds:6.1f}  "
+              f"mismatches {differing or 'none'}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares the vectorized indicator engine with the ta strategies")
+    parser.add_argument('--db', default=os.path.join(os.path.dirname(__file__), '../database.sqlite'))
+    parser.add_argument('--limit', type=int, help="only the first symbols of the database")
+    parser.add_argument('--synthetic', type=int, help="use this many synthetic symbols instead of the database")
+    parser.add_argument('--years', type=int, default=10, help="history of the synthetic symbols")
+    parser.add_argument('--tolerance', type=float, default=0.01, help="allowed difference of the rounded values")
+    args = parser.parse_args()
+    if args.synthetic:
+        data = load_synthetic(args.synthetic, args.years)
+    else:
+        data = load_database(args.db, args.limit)
+    report = run(data, args.tolerance)
+    if any(result['mismatches'] for result in report.values()):
+        sys.exit(1)
@@ -2,7 +2,7 @@ import os
 import sqlite3
 import pandas as pd
 from typing import List, Optional
-from src import technical_analysis, sentimental_analysis, LSTM_analysis
+from src import technical_analysis, sentimental_analysis, LSTM_analysis, price_store, indicator_state
 
 
 class StockDataProcessor:
@@ -10,30 +10,37 @@ class StockDataProcessor:
     Handles data retrieval and analysis for stock data stored in the SQLite database.
     """
 
-    def __init__(self, db_name: str = "database.sqlite"):
+    def __init__(self, db_name: str = "database.sqlite", snapshot_dir: str = "snapshot",
+                 state_name: str = "indicator_state.sqlite"):
         self.db_path = os.path.join(os.getcwd(), db_name)
+        self.snapshot_dir = os.path.join(os.getcwd(), snapshot_dir)
+        self.prices = price_store.shared(self.db_path, self.snapshot_dir)
+        self.state_store = indicator_state.StateStore(os.path.join(os.getcwd(), state_name))
 
-    def get_data_for(self, name: str) -> pd.DataFrame:
+    def get_data_for(self, name: str, time_period: str = 'All time') -> pd.DataFrame:
         """
-        Retrieves data for a specific stock.
+        Retrieves data for a specific stock from the shared price store.
 
         :param name: The name of the stock (table name in the database).
-        :return: DataFrame containing the stock data.
+        :param time_period: Only the rows of this time period, as in technical_analysis.filter_data.
+        :return: DataFrame containing the stock data, with Date as datetimes.
+        """
+        return self.prices.frame(name, ['Last_trade_price', 'Max', 'Min'],
+                                 technical_analysis.period_start(time_period), parse_dates=True)
+
+    def get_indicator_state(self, name: str) -> indicator_state.IndicatorState:
+        """
+        Retrieves the all time indicators of a stock, only the rows added since the last run are read.
+
+        :param name: The name of the stock (table name in the database).
+        :return: The indicator state after the last stored row.
         """
         conn = sqlite3.connect(self.db_path)
         try:
-            cursor = conn.cursor()
-            cursor.execute(f"SELECT Date, Last_trade_price, Max, Min FROM {name}")
-            column_names = [description[0] for description in cursor.description]
-            rows = cursor.fetchall()
+            return indicator_state.catch_up(self.state_store, name, conn)
         finally:
             conn.close()
 
-        df = pd.DataFrame(rows, columns=column_names)
-        df = df.iloc[::-1].reset_index(drop=True)  # Reverse order of the data
-        df['Date'] = pd.to_datetime(df['Date'], dayfirst=True)  # Convert 'Date' to datetime
-        return df
-
     def get_table_names(self, limit: Optional[int] = None) -> List[str]:
         """
         Retrieves the list of table names from the database.
@@ -44,7 +51,9 @@ class StockDataProcessor:
         conn = sqlite3.connect(self.db_path)
         try:
             cursor = conn.cursor()
-            query = "SELECT name FROM sqlite_master WHERE type='table'"
+            # Per code tables, or the per code views of the long layout where every code is in the prices table
+            query = ("SELECT name FROM sqlite_master WHERE type IN ('table', 'view') "
+                     "AND name NOT LIKE 'sqlite_%' AND name NOT IN ('prices', 'market_summary', 'bars')")
             if limit is not None:
                 query += f" LIMIT {limit}"
             cursor.execute(query)
@@ -73,10 +82,14 @@ class StockAnalyzer:
 
         # Get technical indicators for the stock
         df = self.processor.get_data_for(stock_name)
-        df_filtered = technical_analysis.filter_data(df, '1 year')
+        df_filtered = technical_analysis.filter_data(df, '1 year')  # a slice of df, found by binary search
         indicators = technical_analysis.calc_indicators(df_filtered)
         technical_analysis.print_results(indicators, df_filtered)
 
+        # The indicators over the whole history are kept current incrementally between runs
+        print("\nAll time:")
+        technical_analysis.print_results(self.processor.get_indicator_state(stock_name).values(), df)
+
         # Perform sentiment analysis
         sentiment_action = sentimental_analysis.analyze_news_for_stock(stock_name)
         print(f"Sentiment Analysis for {stock_name}: {sentiment_action}")
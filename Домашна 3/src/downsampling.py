@@ -0,0 +1,46 @@
+import numpy as np
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Picks the points of a series that best preserve its shape with Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept. The points in between are split into threshold - 2 buckets,
+    and from each bucket the point is kept that forms the largest triangle with the point kept from the
+    previous bucket and the average of the next bucket. Peaks and drops survive, unlike with plain striding.
+
+    :param x: Ascending x coordinates, e.g. days since 1970-01-01.
+    :param y: The values, NaN values are treated as 0 when choosing points.
+    :param threshold: Maximum number of points to keep, at least 3.
+    :return: Ascending indices of the kept points, all indices when the series is not longer than threshold.
+    """
+    length = len(y)
+    if threshold >= length or threshold < 3:
+        return np.arange(length)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+    # bucket i covers the points edges[i]:edges[i + 1], the first and last points are buckets of their own
+    edges = np.floor(np.arange(threshold - 1) * (length - 2) / (threshold - 2)).astype(np.int64) + 1
+    edges[-1] = length - 1
+    prefix_x = np.concatenate(([0.0], np.cumsum(x)))
+    prefix_y = np.concatenate(([0.0], np.cumsum(y)))
+
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = length - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_end = end, edges[bucket + 2]
+        else:
+            next_start, next_end = length - 1, length
+        count = next_end - next_start
+        average_x = (prefix_x[next_end] - prefix_x[next_start]) / count
+        average_y = (prefix_y[next_end] - prefix_y[next_start]) / count
+        # twice the triangle area, the constant factor does not change which point is largest
+        areas = np.abs((x[previous] - average_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (average_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        indices[bucket + 1] = previous
+    return indices
@@ -0,0 +1,126 @@
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Callable, Optional
+
+
+class IndicatorCache:
+    """
+    Bounded LRU cache of calc_indicators results.
+
+    An entry is keyed by symbol, time period, bar interval, how it was computed, the last stored date of
+    the symbol, today's date (the time periods are counted back from today) and the data version. A new
+    trading day therefore never hits an old entry, and neither does anything computed before the scraper
+    bumped the version file it writes next to the database after every run.
+    """
+
+    def __init__(self, maxsize: int = 512, version_path: Optional[str] = None):
+        """
+        :param maxsize: Number of results kept, the least recently used one is dropped first.
+        :param version_path: The scraper's data_version file, None when the version is only bumped in process.
+        """
+        self.maxsize = maxsize
+        self.version_path = version_path
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._local_version = 0
+        self._file_version = (None, 0)
+
+    def version(self) -> tuple:
+        """
+        :return: The data version, the scraper's version file is only read again when its mtime changed.
+        """
+        file_version = 0
+        if self.version_path is not None:
+            try:
+                mtime = os.path.getmtime(self.version_path)
+            except OSError:
+                mtime = None
+            if mtime != self._file_version[0]:
+                try:
+                    with open(self.version_path, encoding='utf-8') as f:
+                        self._file_version = (mtime, int(f.read().strip() or 0))
+                except (OSError, ValueError):
+                    self._file_version = (mtime, 0)
+            file_version = self._file_version[1]
+        return file_version, self._local_version
+
+    def key(self, symbol: str, time_period: str, last_date: Optional[str], interval: str = 'day',
+            source: str = 'window') -> tuple:
+        """
+        :param source: How the indicators were computed, e.g. 'window' for calc_indicators over the rows of
+                       the period and 'state' for the incremental indicator state, never shared.
+        """
+        return symbol, time_period, interval, source, last_date, date.today().isoformat(), self.version()
+
+    def get(self, symbol: str, time_period: str, last_date: Optional[str], interval: str = 'day',
+            source: str = 'window') -> Optional[dict]:
+        """
+        :return: The cached indicators, or None when they have to be computed. Counts a hit or a miss.
+        """
+        key = self.key(symbol, time_period, last_date, interval, source)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, symbol: str, time_period: str, last_date: Optional[str], value: dict, interval: str = 'day',
+            source: str = 'window') -> None:
+        key = self.key(symbol, time_period, last_date, interval, source)
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, symbol: str, time_period: str, last_date: Optional[str],
+                       compute: Callable[[], dict], interval: str = 'day', source: str = 'window') -> dict:
+        """
+        Returns the cached indicators or computes and caches them.
+
+        :param symbol: The stock symbol.
+        :param time_period: The time period the indicators are computed over, e.g. '1 year'.
+        :param last_date: The last stored date of the symbol.
+        :param compute: Computes the indicators on a miss.
+        :param interval: The bars they are computed from, 'day', 'week' or 'month'.
+        :param source: How compute computes them, 'window' or 'state'.
+        :return: The indicators, shared with later hits so they must not be modified.
+        """
+        value = self.get(symbol, time_period, last_date, interval, source)
+        if value is None:
+            value = compute()
+            self.put(symbol, time_period, last_date, value, interval, source)
+        return value
+
+    def invalidate(self, symbol: Optional[str] = None) -> None:
+        """
+        :param symbol: Drops the entries of this symbol, or every entry when None.
+        """
+        with self._lock:
+            if symbol is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == symbol]:
+                    del self._entries[key]
+
+    def bump(self) -> None:
+        """
+        Makes every cached entry stale without reading the version file, e.g. after writing to the database
+        from this process.
+        """
+        with self._lock:
+            self._local_version += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'size': len(self._entries), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0}
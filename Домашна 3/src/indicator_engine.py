@@ -0,0 +1,174 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# a block of a recurrence ends before its running product of decays drops below exp(LOG_FLOOR)
+LOG_FLOOR = -600.0
+
+
+def linear_recurrence(decay: np.ndarray, inflow: np.ndarray, first: float) -> np.ndarray:
+    """
+    Solves y[0] = first, y[t] = decay[t] * y[t - 1] + inflow[t] without a Python step per element.
+
+    With P[t] the product of the decays of a block up to t, every y[t] of the block is
+    P[t] * (y before the block + the cumulative sum of inflow / P). A new block starts before P
+    underflows, so long histories need only a handful of blocks.
+
+    :param decay: Decays in (0, 1], decay[0] is not used.
+    :param inflow: Inflows, inflow[0] is not used.
+    :param first: The value of y[0].
+    :return: y, aligned with the inputs.
+    """
+    length = len(decay)
+    result = np.empty(length)
+    if length == 0:
+        return result
+    result[0] = first
+    logs = np.cumsum(np.log(decay[1:]))
+    previous = first
+    start = 0
+    while start < length - 1:
+        base = logs[start - 1] if start > 0 else 0.0
+        end = max(start + 1, int(np.searchsorted(-logs, -(base + LOG_FLOOR), side='right')))
+        products = np.exp(logs[start:end] - base)
+        block = products * (previous + np.cumsum(inflow[start + 1:end + 1] / products))
+        result[start + 1:end + 1] = block
+        previous = block[-1]
+        start = end
+    return result
+
+
+def ewm(values: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    :return: The exponentially weighted mean pandas computes with ewm(alpha=alpha, adjust=False).mean().
+    """
+    return linear_recurrence(np.full(len(values), 1.0 - alpha), alpha * values, values[0])
+
+
+def window_view(values: np.ndarray, window: int, pad: float) -> np.ndarray:
+    """
+    :return: A read-only view with the window of rows ending at every row, padded in front with pad.
+    """
+    return sliding_window_view(np.concatenate((np.full(window - 1, pad), values)), window)
+
+
+def rolling_mean(values: np.ndarray, window: int, partial: bool = True) -> np.ndarray:
+    """
+    :param partial: Average the rows available for the first window - 1 rows, as pandas does with
+                    min_periods=0, instead of returning NaN for them.
+    :return: The mean of the window ending at every row.
+    """
+    means = window_view(values, window, 0.0).sum(axis=1) / np.minimum(np.arange(1, len(values) + 1), window)
+    if not partial:
+        means[:window - 1] = np.nan
+    return means
+
+
+def rolling_max(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    :return: The maximum of the rows available in the window ending at every row.
+    """
+    return window_view(values, window, -np.inf).max(axis=1)
+
+
+def rolling_min(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    :return: The minimum of the rows available in the window ending at every row.
+    """
+    return window_view(values, window, np.inf).min(axis=1)
+
+
+def fill_forward(values: np.ndarray, value: float) -> np.ndarray:
+    """
+    Replaces infinities and NaN with the previous valid value, and with value before the first one,
+    which is what the ta indicators do with fillna=True.
+    """
+    valid = np.isfinite(values)
+    if valid.all():
+        return values
+    positions = np.maximum.accumulate(np.where(valid, np.arange(len(values)), -1))
+    return np.where(positions >= 0, values[np.maximum(positions, 0)], value)
+
+
+def rsi(close: np.ndarray, window: int = 14) -> np.ndarray:
+    diff = np.diff(close, prepend=close[0])
+    up = ewm(np.where(diff > 0, diff, 0.0), 1 / window)
+    down = ewm(np.where(diff < 0, -diff, 0.0), 1 / window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = np.where(down == 0, 100.0, 100 - 100 / (1 + up / down))
+    # an unchanged price decays both averages alike and leaves the RSI as it was. Carrying it over keeps
+    # it exactly flat, Stochastic RSI divides by its range and would turn rounding noise into signals
+    changed = np.flatnonzero(diff != 0)
+    positions = np.zeros(len(close), dtype=np.int64)
+    positions[changed] = changed
+    return values[np.maximum.accumulate(positions)]
+
+
+def stoch_rsi_d(rsi_values: np.ndarray, window: int = 14, smooth1: int = 3, smooth2: int = 3) -> np.ndarray:
+    windows = window_view(rsi_values, window, np.nan)
+    lowest = windows.min(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stoch = (rsi_values - lowest) / (windows.max(axis=1) - lowest)
+    stoch[:window - 1] = np.nan
+    k = rolling_mean(stoch, smooth1, partial=False)
+    return fill_forward(rolling_mean(k, smooth2, partial=False), 0.0)
+
+
+def cci(typical: np.ndarray, window: int = 20, constant: float = 0.015) -> np.ndarray:
+    """
+    :param typical: The typical price, (high + low + close) / 3.
+    """
+    means = np.empty(len(typical))
+    deviations = np.empty(len(typical))
+    # the mean absolute deviation the way ta computes it for every window, the partial windows at the
+    # start are too few to vectorize
+    for end in range(1, min(window, len(typical) + 1)):
+        part = typical[:end]
+        means[end - 1] = np.mean(part)
+        deviations[end - 1] = np.mean(np.abs(part - means[end - 1]))
+    if len(typical) >= window:
+        windows = sliding_window_view(typical, window)
+        full_means = windows.mean(axis=1)
+        means[window - 1:] = full_means
+        deviations[window - 1:] = np.abs(windows - full_means[:, None]).mean(axis=1)
+        # pandas returns the value itself for the mean of a window of equal values
+        flat = windows.max(axis=1) == windows.min(axis=1)
+        means[window - 1:][flat] = typical[window - 1:][flat]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return fill_forward((typical - means) / (constant * deviations), 0.0)
+
+
+def trix(triple: np.ndarray) -> np.ndarray:
+    """
+    :param triple: The close smoothed three times by the same EMA.
+    :return: The change of triple from the previous row in percent.
+    """
+    previous = np.concatenate(([triple.mean()], triple[:-1]))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return fill_forward((triple - previous) / previous * 100, 0.0)
+
+
+def kama(close: np.ndarray, window: int = 10, pow1: int = 2, pow2: int = 30) -> np.ndarray:
+    # np.roll wraps the last rows around to the first ones, ta does the same and its early values carry
+    # into the latest ones for hundreds of rows
+    change = np.abs(close - np.roll(close, window))
+    volatility = window_view(np.abs(close - np.roll(close, 1)), window, 0.0).sum(axis=1)
+    efficiency = np.divide(change, volatility, out=np.zeros_like(change), where=volatility != 0)
+    smoothing = (efficiency * (2.0 / (pow1 + 1) - 2.0 / (pow2 + 1.0)) + 2 / (pow2 + 1.0)) ** 2.0
+    # the wrapped rows can have an efficiency above 1, they are stepped through one by one. From the
+    # window-th row on the efficiency is at most 1 and every decay within (0, 1)
+    head = min(window, len(close))
+    result = np.empty(len(close))
+    result[0] = close[0]
+    for i in range(1, head):
+        result[i] = result[i - 1] + smoothing[i] * (close[i] - result[i - 1])
+    result[head - 1:] = linear_recurrence(1.0 - smoothing[head - 1:], smoothing[head - 1:] * close[head - 1:],
+                                          result[head - 1])
+    return result
+
+
+def wma(close: np.ndarray, window: int = 9) -> np.ndarray:
+    weights = np.arange(1, window + 1) * 2 / (window * (window + 1))
+    result = np.zeros(len(close))
+    if len(close) >= window:
+        result[window - 1:] = sliding_window_view(close, window) @ weights
+    return result
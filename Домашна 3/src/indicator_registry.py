@@ -0,0 +1,286 @@
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    from . import indicator_engine as engine
+except ImportError:
+    # imported as a top level module, with this directory on sys.path
+    import indicator_engine as engine
+
+# the price arrays every evaluation starts from
+PRICE_INPUTS = ['close', 'high', 'low']
+
+
+def bands(buy_below: float, sell_above: float) -> Callable[[float, float], str]:
+    """
+    :return: An action that sells above sell_above and buys below buy_below, e.g. RSI with 30 and 70.
+    """
+    def action(value: float, close: float) -> str:
+        if value > sell_above:
+            return 'Sell'
+        if value < buy_below:
+            return 'Buy'
+        return 'Hold'
+    return action
+
+
+def sign(value: float, close: float) -> str:
+    """
+    Buys on a positive value and sells on a negative one.
+    """
+    if value > 0:
+        return 'Buy'
+    if value < 0:
+        return 'Sell'
+    return 'Hold'
+
+
+def price_cross(value: float, close: float) -> str:
+    """
+    Buys when the price is above the average and sells when it is below.
+    """
+    if close > value:
+        return 'Buy'
+    if close < value:
+        return 'Sell'
+    return 'Hold'
+
+
+class Indicator:
+    """
+    One node of the registry: an indicator that is reported, or an intermediate result shared by others.
+    """
+
+    def __init__(self, name: str, compute: Callable[..., np.ndarray], inputs: Sequence[str], lookback: int = 0,
+                 group: Optional[str] = None, action: Optional[Callable[[float, float], str]] = None):
+        """
+        :param name: Name the indicator is reported and depended on by.
+        :param compute: Called with the arrays of the inputs, returns an array aligned with the rows.
+        :param inputs: Names of the price inputs or registered indicators it is computed from.
+        :param lookback: Rows it needs for a meaningful value, fewer rows report None.
+        :param group: The group it is reported in, e.g. 'Oscillators'. None for intermediate results.
+        :param action: Called with the latest value and price, returns 'Buy', 'Sell' or 'Hold'.
+        """
+        self.name = name
+        self.compute = compute
+        self.inputs = list(inputs)
+        self.lookback = lookback
+        self.group = group
+        self.action = action
+
+
+class IndicatorRegistry:
+    """
+    Indicators with their inputs, lookbacks and intermediate dependencies.
+
+    An evaluation computes only what the requested indicators depend on, and every intermediate result,
+    e.g. RSI or an EMA, once however many indicators use it. A new indicator is a register call: it is
+    then reported by calc_indicators and its action is used by get_action.
+    """
+
+    def __init__(self):
+        self.indicators: Dict[str, Indicator] = {}
+
+    def register(self, name: str, inputs: Sequence[str], lookback: int = 0, group: Optional[str] = None,
+                 action: Optional[Callable[[float, float], str]] = None):
+        """
+        Decorator that registers the decorated function as the indicator's compute function.
+
+        :param name: Name the indicator is reported and depended on by, registering it again replaces it.
+        :param inputs: Names of the price inputs or already registered indicators it is computed from.
+        :param lookback: Rows it needs for a meaningful value, fewer rows report None.
+        :param group: The group it is reported in, None for intermediate results.
+        :param action: Called with the latest value and price, returns 'Buy', 'Sell' or 'Hold'.
+        """
+        unknown = [dependency for dependency in inputs
+                   if dependency not in PRICE_INPUTS and dependency not in self.indicators]
+        if unknown:
+            raise ValueError(f"{name} depends on unregistered {', '.join(unknown)}")
+
+        def decorator(compute: Callable[..., np.ndarray]) -> Callable[..., np.ndarray]:
+            self.indicators[name] = Indicator(name, compute, inputs, lookback, group, action)
+            return compute
+        return decorator
+
+    def groups(self) -> Dict[str, List[str]]:
+        """
+        :return: The reported indicators by group, both in registration order.
+        """
+        result: Dict[str, List[str]] = {}
+        for indicator in self.indicators.values():
+            if indicator.group is not None:
+                result.setdefault(indicator.group, []).append(indicator.name)
+        return result
+
+    def lookback(self, name: str) -> int:
+        """
+        :return: The rows the indicator needs, the largest lookback among it and its dependencies.
+        """
+        indicator = self.indicators[name]
+        return max([indicator.lookback] + [self.lookback(dependency) for dependency in indicator.inputs
+                                           if dependency not in PRICE_INPUTS])
+
+    def evaluate(self, prices: Dict[str, np.ndarray], names: Sequence[str]) -> Dict[str, np.ndarray]:
+        """
+        Computes the indicators and everything they depend on, each once.
+
+        :param prices: The 'close', 'high' and 'low' float64 arrays.
+        :param names: The indicators wanted.
+        :return: Dict with the arrays of the indicators and of their dependencies, by name.
+        """
+        results = dict(prices)
+
+        def compute(name: str) -> np.ndarray:
+            if name not in results:
+                indicator = self.indicators[name]
+                results[name] = indicator.compute(*[compute(dependency) for dependency in indicator.inputs])
+            return results[name]
+
+        for name in names:
+            compute(name)
+        return results
+
+    def calc_indicators(self, close: np.ndarray, high: np.ndarray, low: np.ndarray, series: bool = False,
+                        names: Optional[Sequence[str]] = None) -> dict:
+        """
+        The latest value of the reported indicators, grouped like technical_analysis.calc_indicators.
+
+        :param close: Last trade prices in ascending date order, finite values only.
+        :param high: Daily maximums aligned with close.
+        :param low: Daily minimums aligned with close.
+        :param series: Also return the full series under 'Series', e.g. for overlays on a chart.
+        :param names: Only these indicators, by default every reported one.
+        :return: {group: {name: value}} with values rounded to 2 decimals, None for the indicators there
+                 are too few rows for. With series, 'Series' maps every indicator to its values aligned
+                 with the rows, or None.
+        """
+        length = len(close)
+        groups = {group: [name for name in members if names is None or name in names]
+                  for group, members in self.groups().items()}
+        groups = {group: members for group, members in groups.items() if members}
+        wanted = [name for members in groups.values() for name in members if length >= self.lookback(name)]
+        computed: Dict[str, np.ndarray] = {}
+        if wanted and length:
+            prices = {'close': np.asarray(close, dtype=np.float64), 'high': np.asarray(high, dtype=np.float64),
+                      'low': np.asarray(low, dtype=np.float64)}
+            computed = self.evaluate(prices, wanted)
+        result = {group: {name: round(float(computed[name][-1]), 2) if name in wanted else None
+                          for name in members}
+                  for group, members in groups.items()}
+        if series:
+            result['Series'] = {name: computed[name] if name in wanted else None
+                                for members in groups.values() for name in members}
+        return result
+
+    def action(self, name: str, value: Optional[float], close: float) -> str:
+        """
+        :return: The action the indicator suggests for its value at the given price, 'Hold' for no value or
+                 an indicator without an action.
+        """
+        indicator = self.indicators.get(name)
+        if value is None or indicator is None or indicator.action is None:
+            return 'Hold'
+        return indicator.action(value, close)
+
+
+registry = IndicatorRegistry()
+
+
+# intermediate results, shared by the indicators below
+
+@registry.register('typical price', ['close', 'high', 'low'])
+def typical_price(close, high, low):
+    return (high + low + close) / 3.0
+
+
+@registry.register('median price', ['high', 'low'])
+def median_price(high, low):
+    return 0.5 * (high + low)
+
+
+@registry.register('rsi 14', ['close'])
+def rsi_14(close):
+    return engine.rsi(close, 14)
+
+
+@registry.register('ema 14', ['close'])
+def ema_14(close):
+    return engine.ewm(close, 2 / (14 + 1))
+
+
+@registry.register('ema 15', ['close'])
+def ema_15(close):
+    return engine.ewm(close, 2 / (15 + 1))
+
+
+@registry.register('ema 15 of ema 15', ['ema 15'])
+def ema_15_twice(ema):
+    return engine.ewm(ema, 2 / (15 + 1))
+
+
+@registry.register('ema 15 of ema 15 of ema 15', ['ema 15 of ema 15'])
+def ema_15_thrice(ema):
+    return engine.ewm(ema, 2 / (15 + 1))
+
+
+@registry.register('high max 9', ['high'])
+def high_max_9(high):
+    return engine.rolling_max(high, 9)
+
+
+@registry.register('low min 9', ['low'])
+def low_min_9(low):
+    return engine.rolling_min(low, 9)
+
+
+# the reported indicators, with the ta default parameters calc_indicators has always used
+
+@registry.register('Relative Strength Index', ['rsi 14'], 14, 'Oscillators', bands(30, 70))
+def relative_strength_index(rsi):
+    return rsi
+
+
+@registry.register('Stochastic RSI %D', ['rsi 14'], 14, 'Oscillators', bands(20, 80))
+def stochastic_rsi_d(rsi):
+    return engine.stoch_rsi_d(rsi, 14, 3, 3)
+
+
+@registry.register('Commodity Channel Index', ['typical price'], 20, 'Oscillators', bands(-100, 100))
+def commodity_channel_index(typical):
+    return engine.cci(typical, 20, 0.015)
+
+
+@registry.register('Trix', ['ema 15 of ema 15 of ema 15'], 15, 'Oscillators', sign)
+def trix(triple):
+    return engine.trix(triple)
+
+
+@registry.register('Awesome Oscillator', ['median price'], 34, 'Oscillators', sign)
+def awesome_oscillator(median):
+    return engine.rolling_mean(median, 5) - engine.rolling_mean(median, 34)
+
+
+@registry.register('Simple Moving Average', ['close'], 4, 'Moving averages', price_cross)
+def simple_moving_average(close):
+    return engine.rolling_mean(close, 2)
+
+
+@registry.register('Exponential Moving Average', ['ema 14'], 14, 'Moving averages', price_cross)
+def exponential_moving_average(ema):
+    return ema
+
+
+@registry.register('Ichimoku', ['high max 9', 'low min 9'], 52, 'Moving averages', price_cross)
+def ichimoku_conversion_line(highest, lowest):
+    return 0.5 * (highest + lowest)
+
+
+@registry.register('Kaufman’s Adaptive Moving Average', ['close'], 40, 'Moving averages', price_cross)
+def kaufman_adaptive_moving_average(close):
+    return engine.kama(close, 10, 2, 30)
+
+
+@registry.register('Weighted Moving Average', ['close'], 9, 'Moving averages', price_cross)
+def weighted_moving_average(close):
+    return engine.wma(close, 9)
@@ -0,0 +1,310 @@
+import json
+import math
+import sqlite3
+import threading
+from collections import deque
+from typing import Optional
+
+import numpy as np
+
+try:
+    from .indicator_registry import registry
+    from .price_store import quote
+except ImportError:
+    # imported as a top level module, with this directory on sys.path
+    from indicator_registry import registry
+    from price_store import quote
+
+# the windows of the indicators, the ta defaults calc_indicators uses
+RSI_WINDOW = 14
+STOCH_SMOOTH = 3
+CCI_WINDOW = 20
+CCI_CONSTANT = 0.015
+TRIX_WINDOW = 15
+AWESOME_WINDOWS = (5, 34)
+SMA_WINDOW = 2
+EMA_WINDOW = 14
+ICHIMOKU_WINDOW = 9
+KAMA_WINDOW = 10
+KAMA_FAST = 2 / (2 + 1)
+KAMA_SLOW = 2 / (30 + 1)
+WMA_WINDOW = 9
+WMA_WEIGHTS = [i * 2 / (WMA_WINDOW * (WMA_WINDOW + 1)) for i in range(1, WMA_WINDOW + 1)]
+# the windows kept between bars, by the name of the attribute that holds them
+WINDOWS = {
+    'rsi_window': RSI_WINDOW,
+    'stoch_window': STOCH_SMOOTH,
+    'k_window': STOCH_SMOOTH,
+    'typical_window': CCI_WINDOW,
+    'median_window': max(AWESOME_WINDOWS),
+    'close_window': max(KAMA_WINDOW + 1, WMA_WINDOW, SMA_WINDOW),
+    'high_window': ICHIMOKU_WINDOW,
+    'low_window': ICHIMOKU_WINDOW,
+}
+
+
+def mean(values) -> float:
+    return sum(values) / len(values)
+
+
+class IndicatorState:
+    """
+    The indicators of calc_indicators over a symbol's whole history, updated one bar at a time.
+
+    The recursive indicators (EMA, TRIX, KAMA and the averages of RSI) keep their last values and the
+    windowed ones (SMA, WMA, CCI, Ichimoku, Awesome, Stochastic RSI) keep the last few bars they need, so
+    a new bar costs the same however long the history is. The values agree with
+    technical_analysis.calc_indicators over all rows, except that KAMA starts from the rows that exist
+    instead of wrapping around to the last ones like ta, which only shows in short histories.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.first_date: Optional[str] = None
+        self.last_date: Optional[str] = None
+        # the close, high and low of the last date as they were read, None for a missing price
+        self.last_row: Optional[list] = None
+        self.close: Optional[float] = None
+        self.rsi_up = 0.0
+        self.rsi_down = 0.0
+        self.rsi: Optional[float] = None
+        self.stoch_d = 0.0
+        self.cci = 0.0
+        self.ema: Optional[float] = None
+        self.ema1: Optional[float] = None
+        self.ema2: Optional[float] = None
+        self.ema3: Optional[float] = None
+        self.trix = 0.0
+        self.kama: Optional[float] = None
+        for name, size in WINDOWS.items():
+            setattr(self, name, deque(maxlen=size))
+
+    def update(self, date: str, close: float, high: float, low: float) -> None:
+        """
+        Adds the next bar.
+
+        :param date: The YYYY-MM-DD date of the bar, after the date of the previous one.
+        :param close: Last trade price.
+        :param high: Maximum of the day.
+        :param low: Minimum of the day.
+        """
+        previous = self.close
+        self.rows += 1
+        self.first_date = self.first_date or date
+        self.last_date = date
+        self.close = close
+
+        self._update_rsi(previous, close)
+        self._update_cci((high + low + close) / 3.0)
+        self._update_trix(close)
+        self.ema = close if self.ema is None else self.ema + 2 / (EMA_WINDOW + 1) * (close - self.ema)
+        self._update_kama(close)
+        self.median_window.append(0.5 * (high + low))
+        self.close_window.append(close)
+        self.high_window.append(high)
+        self.low_window.append(low)
+
+    def _update_rsi(self, previous: Optional[float], close: float) -> None:
+        diff = 0.0 if previous is None else close - previous
+        alpha = 1 / RSI_WINDOW
+        self.rsi_up += alpha * (max(diff, 0.0) - self.rsi_up)
+        self.rsi_down += alpha * (max(-diff, 0.0) - self.rsi_down)
+        # an unchanged price leaves the RSI as it was, like in indicator_engine.rsi
+        if diff != 0 or self.rsi is None:
+            self.rsi = 100.0 if self.rsi_down == 0 else 100 - 100 / (1 + self.rsi_up / self.rsi_down)
+        self.rsi_window.append(self.rsi)
+
+        stoch = None
+        if len(self.rsi_window) == RSI_WINDOW:
+            lowest, highest = min(self.rsi_window), max(self.rsi_window)
+            if highest > lowest:
+                stoch = (self.rsi - lowest) / (highest - lowest)
+        self.stoch_window.append(stoch)
+        k = None
+        if len(self.stoch_window) == STOCH_SMOOTH and None not in self.stoch_window:
+            k = mean(self.stoch_window)
+        self.k_window.append(k)
+        if len(self.k_window) == STOCH_SMOOTH and None not in self.k_window:
+            self.stoch_d = mean(self.k_window)
+
+    def _update_cci(self, typical: float) -> None:
+        self.typical_window.append(typical)
+        # averaged with NumPy like indicator_engine.cci, a window of equal prices then has the same
+        # deviation, zero or a rounding error, in both
+        window = np.array(self.typical_window)
+        average = np.mean(window)
+        deviation = np.mean(np.abs(window - average))
+        if window.max() == window.min():
+            average = typical
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cci = float((typical - average) / (CCI_CONSTANT * deviation))
+        if math.isfinite(cci):
+            self.cci = cci
+
+    def _update_trix(self, close: float) -> None:
+        alpha = 2 / (TRIX_WINDOW + 1)
+        if self.ema1 is None:
+            self.ema1 = self.ema2 = self.ema3 = close
+            return
+        previous = self.ema3
+        self.ema1 += alpha * (close - self.ema1)
+        self.ema2 += alpha * (self.ema1 - self.ema2)
+        self.ema3 += alpha * (self.ema2 - self.ema3)
+        if previous != 0:
+            self.trix = (self.ema3 - previous) / previous * 100
+
+    def _update_kama(self, close: float) -> None:
+        # close_window still holds the previous bars, the oldest is KAMA_WINDOW bars back once it is full
+        closes = list(self.close_window)[-KAMA_WINDOW:] + [close]
+        change = abs(close - closes[0])
+        volatility = sum(abs(b - a) for a, b in zip(closes, closes[1:]))
+        efficiency = change / volatility if volatility != 0 else 0.0
+        smoothing = (efficiency * (KAMA_FAST - KAMA_SLOW) + KAMA_SLOW) ** 2.0
+        self.kama = close if self.kama is None else self.kama + smoothing * (close - self.kama)
+
+    def series_values(self) -> dict:
+        """
+        :return: Dict of indicator name to its unrounded value at the last bar.
+        """
+        closes = list(self.close_window)
+        wma = 0.0
+        if len(closes) >= WMA_WINDOW:
+            wma = sum(weight * value for weight, value in zip(WMA_WEIGHTS, closes[-WMA_WINDOW:]))
+        medians = list(self.median_window)
+        return {
+            'Relative Strength Index': self.rsi,
+            'Stochastic RSI %D': self.stoch_d,
+            'Commodity Channel Index': self.cci,
+            'Trix': self.trix,
+            'Awesome Oscillator': mean(medians[-AWESOME_WINDOWS[0]:]) - mean(medians[-AWESOME_WINDOWS[1]:]),
+            'Simple Moving Average': mean(closes[-SMA_WINDOW:]),
+            'Exponential Moving Average': self.ema,
+            'Ichimoku': 0.5 * (max(self.high_window) + min(self.low_window)),
+            'Kaufman’s Adaptive Moving Average': self.kama,
+            'Weighted Moving Average': wma,
+        }
+
+    def values(self) -> dict:
+        """
+        :return: {'Oscillators': {...}, 'Moving averages': {...}} like calc_indicators over all rows, rounded
+                 to 2 decimals and None where there are too few rows. Registered indicators the state
+                 does not follow are None as well.
+        """
+        current = self.series_values() if self.rows else {}
+        return {group: {name: round(current[name], 2) if name in current and self.rows >= registry.lookback(name)
+                        else None for name in names}
+                for group, names in registry.groups().items()}
+
+    def to_dict(self) -> dict:
+        """
+        :return: The state as a JSON serializable dict, missing values as None.
+        """
+        return {name: list(value) if isinstance(value, deque) else value for name, value in vars(self).items()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'IndicatorState':
+        """
+        :param data: A dict returned by to_dict.
+        :return: The state, ready for the next bar.
+        """
+        state = cls()
+        for name, value in data.items():
+            if name in WINDOWS:
+                value = deque(value, maxlen=WINDOWS[name])
+            setattr(state, name, value)
+        return state
+
+
+class StateStore:
+    """
+    The IndicatorState of every symbol in a SQLite file, one JSON row per symbol. The threads of a process
+    write one at a time instead of waiting on each other's file lock.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: The SQLite file, created on first use.
+        """
+        self.path = str(path)
+        self._write_lock = threading.Lock()
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("CREATE TABLE IF NOT EXISTS indicator_state "
+                     "(Code TEXT PRIMARY KEY, Date TEXT, Rows INTEGER, State TEXT)")
+        return conn
+
+    def load(self, code: str) -> Optional[IndicatorState]:
+        conn = self.connect()
+        try:
+            row = conn.execute("SELECT State FROM indicator_state WHERE Code = ?", (code,)).fetchone()
+        finally:
+            conn.close()
+        return IndicatorState.from_dict(json.loads(row[0])) if row is not None else None
+
+    def save(self, code: str, state: IndicatorState) -> None:
+        data = json.dumps(state.to_dict())
+        with self._write_lock:
+            conn = self.connect()
+            try:
+                with conn:
+                    conn.execute("INSERT OR REPLACE INTO indicator_state (Code, Date, Rows, State) "
+                                 "VALUES (?, ?, ?, ?)", (code, state.last_date, state.rows, data))
+            finally:
+                conn.close()
+
+
+def missing(value: Optional[float]) -> bool:
+    return value is None or math.isnan(value)
+
+
+def last_rows(rows: list) -> list:
+    """
+    :param rows: Rows sorted by their first value, the date.
+    :return: The rows without the ones followed by a row of the same date, a date stored twice keeps its last row.
+    """
+    return [row for row, following in zip(rows, rows[1:] + [None]) if following is None or following[0] != row[0]]
+
+
+def catch_up(store: StateStore, code: str, conn: sqlite3.Connection) -> IndicatorState:
+    """
+    Brings the stored state of a symbol up to the last row of its table and stores it again.
+
+    Only the rows from the last date of the stored state on are read. A date stored twice counts once
+    with its last row, like in indicator_engine and the scraper's snapshot. When the rows up to that date
+    are no longer the ones the state saw, e.g. after an older day was backfilled or the last day was
+    saved again with other prices, the state is rebuilt from the first row.
+
+    :param store: Where the states are kept between runs.
+    :param code: The symbol, a table or view of the database with Date, Last_trade_price, Max and Min.
+    :param conn: Connection to the scraper's database, only read from.
+    :return: The state after the last row.
+    """
+    table = quote(code)
+    state = store.load(code)
+    rows = []
+    if state is not None and state.last_date is not None:
+        count = conn.execute(f"SELECT COUNT(DISTINCT Date) FROM {table} WHERE Date <= ?",
+                             (state.last_date,)).fetchone()[0]
+        rows = last_rows(conn.execute(f"SELECT Date, Last_trade_price, Max, Min FROM {table} WHERE Date >= ? "
+                                      "ORDER BY Date", (state.last_date,)).fetchall())
+        seen = [None if missing(value) else value for value in rows[0][1:]] if rows else None
+        if count != state.rows or not rows or rows[0][0] != state.last_date or seen != state.last_row:
+            state = None
+        else:
+            rows = rows[1:]
+    if state is None:
+        state = IndicatorState()
+        rows = last_rows(conn.execute(f"SELECT Date, Last_trade_price, Max, Min FROM {table} WHERE Date IS NOT NULL "
+                                      "ORDER BY Date").fetchall())
+    for date, close, high, low in rows:
+        state.last_row = [None if missing(value) else value for value in (close, high, low)]
+        if None in state.last_row:
+            # a missing price still counts as a row, the indicators carry on from the previous one
+            state.rows += 1
+            state.last_date = date
+            continue
+        state.update(date, close, high, low)
+    if rows:
+        store.save(code, state)
+    return state
@@ -0,0 +1,51 @@
+import sqlite3
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# bar intervals besides the daily rows, a bar covers a calendar week (Monday to Sunday) or a calendar month.
+# The scraper builds them (its resampling.py) and this module only reads what it stored
+INTERVALS = ('week', 'month')
+# the table the scraper keeps the bars of every symbol in, rebuilt once a code is written
+BARS_TABLE = 'bars'
+# the bar columns, named like the daily columns they are built from so that code reading daily rows,
+# e.g. calc_indicators, reads bars as well. 'Date' is the first calendar day of the period
+BAR_COLUMNS = {
+    'Start': 'Date',
+    'End': 'End',
+    'Open': 'Open',
+    'Close': 'Last_trade_price',
+    'High': 'Max',
+    'Low': 'Min',
+    'Volume': 'Volume',
+    'Turnover': 'Total_turnover_in_denars',
+    'Days': 'Days',
+}
+
+
+def read_bars(query: Callable[[str, Sequence], Tuple[List[str], List[tuple]]], code: str,
+              interval: str) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Reads the bars the scraper stored for a symbol.
+
+    :param query: Runs a query against the scraper's database, returns (column names, rows).
+    :param code: The symbol.
+    :param interval: 'week' or 'month'.
+    :return: Dict with an array per BAR_COLUMNS value, one element per period with a trading day, 'Date'
+             and 'End' as int32 days since 1970-01-01. None for a database without the bars table.
+    """
+    try:
+        _, rows = query(f"SELECT {', '.join(BAR_COLUMNS)} FROM {BARS_TABLE} WHERE Code = ? AND Interval = ? "
+                        "ORDER BY Start", (code, interval))
+    except sqlite3.OperationalError:
+        return None
+    columns = list(zip(*rows)) if rows else [()] * len(BAR_COLUMNS)
+    result = {}
+    for (column, name), values in zip(BAR_COLUMNS.items(), columns):
+        if column in ('Start', 'End'):
+            result[name] = np.asarray(values, dtype='datetime64[D]').astype(np.int32)
+        elif column == 'Days':
+            result[name] = np.asarray(values, dtype=np.int32)
+        else:
+            result[name] = np.asarray(values, dtype=np.float64)
+    return result
@@ -0,0 +1,125 @@
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 1
+COLUMNS = {
+    'price': 'Last_trade_price',
+    'max': 'Max',
+    'min': 'Min',
+    'volume': 'Volume',
+    'turnover': 'Total_turnover_in_denars',
+}
+
+
+class PriceSnapshot:
+    """
+    Read-only view of the columnar snapshot the scraper publishes after each run.
+
+    Every symbol is a directory of .npy arrays: int32 days since 1970-01-01 in date.npy and float64
+    price, max, min, volume and turnover arrays. They are memory-mapped, so loading a symbol only maps
+    its files and the pages are shared with every other process reading the same snapshot.
+    """
+
+    def __init__(self, directory: str, manifest: dict):
+        self.directory = directory
+        self.manifest = manifest
+        self._arrays: Dict[str, Dict[str, np.ndarray]] = {}
+
+    @classmethod
+    def open(cls, directory: str, db_path: Optional[str] = None) -> Optional['PriceSnapshot']:
+        """
+        Opens the snapshot in the given directory.
+
+        :param directory: Directory the scraper exported the snapshot to.
+        :param db_path: The database the snapshot was exported from. When it was modified after the
+                        export, the snapshot is stale and None is returned.
+        :return: The snapshot, or None when it is missing, stale or of an unknown format.
+        """
+        try:
+            with open(os.path.join(directory, 'manifest.json'), encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get('format') != FORMAT_VERSION:
+            return None
+        if db_path is not None and os.path.getmtime(db_path) > manifest['db_mtime']:
+            return None
+        return cls(directory, manifest)
+
+    def codes(self) -> List[str]:
+        return list(self.manifest['codes'])
+
+    def __contains__(self, code: str) -> bool:
+        return code in self.manifest['codes']
+
+    def arrays(self, code: str) -> Dict[str, np.ndarray]:
+        """
+        Returns the memory-mapped arrays of a symbol without copying them.
+
+        :param code: The symbol, it must be part of the snapshot.
+        :return: Dict with 'date' (int32 days since 1970-01-01) and the float64 COLUMNS arrays.
+        """
+        arrays = self._arrays.get(code)
+        if arrays is None:
+            code_directory = os.path.join(self.directory, code)
+            arrays = {name: np.load(os.path.join(code_directory, f"{name}.npy"), mmap_mode='r')
+                      for name in ['date'] + list(COLUMNS)}
+            self._arrays[code] = arrays
+        return arrays
+
+    def frame(self, code: str, columns: List[str], date_from: Optional[str] = None,
+              date_to: Optional[str] = None) -> pd.DataFrame:
+        """
+        Builds the same DataFrame a 'SELECT Date, <columns> FROM <code> ORDER BY Date' query would.
+
+        :param code: The symbol, it must be part of the snapshot.
+        :param columns: Database column names, e.g. ['Last_trade_price', 'Max', 'Min'].
+        :param date_from: First YYYY-MM-DD date to include, the range is found by binary search.
+        :param date_to: Last YYYY-MM-DD date to include.
+        :return: DataFrame with YYYY-MM-DD Date strings followed by the requested columns.
+        """
+        arrays = self.arrays(code)
+        days = arrays['date']
+        start = 0 if date_from is None else np.searchsorted(days, day_number(date_from), side='left')
+        end = len(days) if date_to is None else np.searchsorted(days, day_number(date_to), side='right')
+        names = {column: name for name, column in COLUMNS.items()}
+        data = {'Date': np.datetime_as_string(days[start:end].astype('datetime64[D]'))}
+        for column in columns:
+            data[column] = arrays[names[column]][start:end]
+        return pd.DataFrame(data)
+
+
+def day_number(value: str) -> int:
+    """
+    :param value: A YYYY-MM-DD date.
+    :return: Days since 1970-01-01, as stored in date.npy.
+    """
+    return int(np.datetime64(value, 'D').astype(np.int64))
+
+
+_current: Dict[str, tuple] = {}
+
+
+def current(directory: str, db_path: Optional[str] = None) -> Optional[PriceSnapshot]:
+    """
+    Returns the snapshot of the directory, reopening it only when the scraper published a new one.
+
+    :param directory: Directory the scraper exported the snapshot to.
+    :param db_path: The database the snapshot was exported from, see PriceSnapshot.open.
+    :return: The snapshot, or None when it is missing or stale.
+    """
+    try:
+        stamp = (os.path.getmtime(os.path.join(directory, 'manifest.json')),
+                 os.path.getmtime(db_path) if db_path is not None else None)
+    except OSError:
+        return None
+    cached = _current.get(directory)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    snapshot = PriceSnapshot.open(directory, db_path)
+    _current[directory] = (stamp, snapshot)
+    return snapshot
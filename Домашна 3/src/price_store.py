@@ -0,0 +1,315 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from . import price_bars, price_snapshot
+except ImportError:
+    # imported as a top level module, with this directory on sys.path
+    import price_bars
+    import price_snapshot
+
+# the columns a symbol is held with, the ones the scraper's snapshot exports as well
+COLUMNS = list(price_snapshot.COLUMNS.values())
+# runs a query, returns (column names, rows)
+Query = Callable[[str, Sequence], Tuple[List[str], List[tuple]]]
+
+
+def quote(name: str) -> str:
+    """
+    :return: The table or column name as an sqlite identifier, e.g. a symbol with a space in it.
+    """
+    return '"' + name.replace('"', '""') + '"'
+
+
+def file_stamp(db_path: str) -> tuple:
+    """
+    :return: The mtime and size of the database and of its write-ahead log. Any write changes one of them,
+             including a new symbol table.
+    """
+    stamp = []
+    for path in (db_path, f"{db_path}-wal"):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stamp.append(None)
+            continue
+        stamp.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(stamp)
+
+
+def to_days(dates) -> np.ndarray:
+    """
+    :param dates: YYYY-MM-DD strings.
+    :return: int32 days since 1970-01-01.
+    """
+    return np.asarray(dates, dtype='datetime64[D]').astype(np.int32)
+
+
+def read_only(arrays: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    for array in arrays.values():
+        if array.flags.writeable:
+            array.flags.writeable = False
+    return arrays
+
+
+class PriceHistory:
+    """
+    The rows of one symbol as read-only arrays sorted by date: int32 days since 1970-01-01 under 'Date'
+    and a float64 array per column of COLUMNS. Its weekly and monthly bars are kept in bars once used.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], stamp: tuple):
+        self.arrays = read_only(arrays)
+        self.stamp = stamp
+        self.nbytes = sum(array.nbytes for array in arrays.values())
+        self.bars: Dict[str, Dict[str, np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return len(self.arrays['Date'])
+
+    def last_day(self) -> Optional[int]:
+        return int(self.arrays['Date'][-1]) if len(self) else None
+
+    def bounds(self, date_from: Optional[str] = None, date_to: Optional[str] = None) -> Tuple[int, int]:
+        """
+        :return: The start and end index of the rows from date_from through date_to, by binary search.
+        """
+        days = self.arrays['Date']
+        start = 0 if date_from is None else int(np.searchsorted(days, price_snapshot.day_number(date_from), 'left'))
+        end = len(days) if date_to is None else int(np.searchsorted(days, price_snapshot.day_number(date_to), 'right'))
+        return start, end
+
+
+class PriceStore:
+    """
+    Process-wide, memory-bounded cache of symbol histories as sorted typed arrays.
+
+    A symbol is read once, from the scraper's snapshot when it is current or else from the database, and
+    time windows are sliced out of it by binary search without copying. When the database changes, a
+    cached symbol is checked again on its next use: its last date is read again with the rows appended
+    after it, since the scraper rewrites the day it last saw, anything else reloads it. The least recently
+    used symbols are dropped once their arrays take more than the memory budget.
+    """
+
+    def __init__(self, db_path: str, snapshot_dir: Optional[str] = None, budget: int = 64 * 2 ** 20,
+                 query: Optional[Query] = None):
+        """
+        :param db_path: The scraper's database.
+        :param snapshot_dir: The directory the scraper exports its snapshot to, None to always read the database.
+        :param budget: Bytes of arrays kept, at least the symbol in use is kept whatever its size.
+        :param query: Runs the store's queries against db_path, e.g. on a pool of connections, by default
+                      every query opens a read-only connection of its own.
+        """
+        self.db_path = str(db_path)
+        self.snapshot_dir = str(snapshot_dir) if snapshot_dir is not None else None
+        self.budget = budget
+        self.query = query if query is not None else self._query
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _query(self, sql: str, params: Sequence = ()) -> Tuple[List[str], List[tuple]]:
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        try:
+            cursor = conn.execute(sql, params)
+            return [description[0] for description in cursor.description], cursor.fetchall()
+        finally:
+            conn.close()
+
+    def _read(self, code: str, since: Optional[str] = None) -> Dict[str, np.ndarray]:
+        where = " AND Date >= ?" if since is not None else ""
+        _, rows = self.query(f"SELECT Date, {', '.join(COLUMNS)} FROM {quote(code)} WHERE Date IS NOT NULL{where} "
+                             "ORDER BY Date", (since,) if since is not None else ())
+        columns = list(zip(*rows)) if rows else [()] * (len(COLUMNS) + 1)
+        days = to_days(columns[0])
+        # a date stored twice keeps its last row, like in the scraper's snapshot
+        keep = np.append(days[1:] != days[:-1], True) if len(days) else np.ones(0, dtype=bool)
+        arrays = {'Date': days[keep]}
+        for name, values in zip(COLUMNS, columns[1:]):
+            arrays[name] = np.array(values, dtype=np.float64)[keep]
+        return arrays
+
+    def _load(self, code: str, stamp: tuple) -> PriceHistory:
+        if self.snapshot_dir is not None:
+            snapshot = price_snapshot.current(self.snapshot_dir, self.db_path)
+            if snapshot is not None and code in snapshot:
+                arrays = snapshot.arrays(code)
+                return PriceHistory({'Date': arrays['date'],
+                                     **{column: arrays[name] for name, column in price_snapshot.COLUMNS.items()}},
+                                    stamp)
+        return PriceHistory(self._read(code), stamp)
+
+    def _refresh(self, code: str, history: PriceHistory, stamp: tuple) -> PriceHistory:
+        if not len(history):
+            return self._load(code, stamp)
+        last = str(np.datetime64(history.last_day(), 'D'))
+        _, rows = self.query(f"SELECT COUNT(DISTINCT Date) FROM {quote(code)} WHERE Date < ?", (last,))
+        if rows[0][0] != len(history) - 1:
+            # rows before the last one were added or removed
+            return PriceHistory(self._read(code), stamp)
+        # the last date is read again, the scraper saves a day that is still trading over its earlier row.
+        # A write between the two queries changes the stamp, so the next use checks the symbol again
+        added = self._read(code, last)
+        return PriceHistory({name: np.concatenate((array[:-1], added[name]))
+                             for name, array in history.arrays.items()}, stamp)
+
+    def history(self, code: str) -> PriceHistory:
+        """
+        Returns the current rows of a symbol, reading only what changed since it was cached.
+
+        :param code: The symbol, a table or view of the database.
+        :return: The symbol's history.
+        """
+        stamp = file_stamp(self.db_path)
+        with self._lock:
+            history = self._entries.get(code)
+            if history is not None:
+                self._entries.move_to_end(code)
+                if history.stamp == stamp:
+                    self.hits += 1
+                    return history
+            self.misses += 1
+        if history is None:
+            history = self._load(code, stamp)
+        else:
+            history = self._refresh(code, history, stamp)
+        with self._lock:
+            previous = self._entries.pop(code, None)
+            if previous is not None:
+                self.nbytes -= previous.nbytes
+            self._entries[code] = history
+            self.nbytes += history.nbytes
+            while self.nbytes > self.budget and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self.evictions += 1
+        return history
+
+    def window(self, code: str, date_from: Optional[str] = None,
+               date_to: Optional[str] = None) -> Dict[str, np.ndarray]:
+        """
+        Returns the rows of a symbol between two dates as read-only views of the cached arrays.
+
+        :param code: The symbol, a table or view of the database.
+        :param date_from: First YYYY-MM-DD date to include.
+        :param date_to: Last YYYY-MM-DD date to include.
+        :return: Dict with 'Date' (int32 days since 1970-01-01) and the COLUMNS arrays.
+        """
+        history = self.history(code)
+        start, end = history.bounds(date_from, date_to)
+        return {name: array[start:end] for name, array in history.arrays.items()}
+
+    def bars(self, code: str, interval: str, date_from: Optional[str] = None,
+             date_to: Optional[str] = None) -> Dict[str, np.ndarray]:
+        """
+        Returns the weekly or monthly bars of a symbol between two dates as read-only arrays.
+
+        The bars the scraper stores are read once per change of the symbol and kept with its rows.
+
+        :param code: The symbol, a table or view of the database.
+        :param interval: 'week' or 'month'.
+        :param date_from: The first bar is the one that contains this YYYY-MM-DD date, or the one after.
+        :param date_to: The last bar is the one that contains this YYYY-MM-DD date, or the one before.
+        :return: Dict with an array per price_bars.BAR_COLUMNS value, 'Date' being the int32 first day of
+                 the period and the prices named like the daily ones.
+        :raises ValueError: For an unknown interval or a database the scraper has not migrated to the bars table.
+        """
+        if interval not in price_bars.INTERVALS:
+            raise ValueError(f"Unknown interval {interval}")
+        history = self.history(code)
+        bars = history.bars.get(interval)
+        if bars is None:
+            bars = price_bars.read_bars(self.query, code, interval)
+            if bars is None:
+                raise ValueError(f"{self.db_path} has no {price_bars.BARS_TABLE} table, run the scraper's migrate")
+            bars = read_only(bars)
+            # kept, and counted against the budget, only when they cover exactly the cached rows. Bars read
+            # while the scraper was writing are served once and read again on the next use
+            current = (int(bars['Days'].sum()) == len(history)
+                       and (not len(history) or int(bars['End'][-1]) == history.last_day()))
+            with self._lock:
+                if current and self._entries.get(code) is history and interval not in history.bars:
+                    history.bars[interval] = bars
+                    added = sum(array.nbytes for array in bars.values())
+                    history.nbytes += added
+                    self.nbytes += added
+        start, end = 0, len(bars['Date'])
+        if date_from is not None:
+            start = int(np.searchsorted(bars['End'], price_snapshot.day_number(date_from), 'left'))
+        if date_to is not None:
+            end = int(np.searchsorted(bars['Date'], price_snapshot.day_number(date_to), 'right'))
+        return {name: array[start:end] for name, array in bars.items()}
+
+    def frame(self, code: str, columns: List[str], date_from: Optional[str] = None,
+              date_to: Optional[str] = None, parse_dates: bool = False, interval: str = 'day') -> pd.DataFrame:
+        """
+        Builds the same DataFrame a 'SELECT Date, <columns> FROM <code> ORDER BY Date' query would.
+
+        :param code: The symbol, a table or view of the database.
+        :param columns: Columns out of COLUMNS, e.g. ['Last_trade_price', 'Max', 'Min'], with an interval
+                        also 'Open' and 'Days'.
+        :param date_from: First YYYY-MM-DD date to include.
+        :param date_to: Last YYYY-MM-DD date to include.
+        :param parse_dates: Dates as datetime64 instead of YYYY-MM-DD strings.
+        :param interval: 'day' for the stored rows, 'week' or 'month' for bars dated by the first day of
+                         their period.
+        :return: DataFrame with the Date column followed by the requested columns.
+        """
+        if interval == 'day':
+            window = self.window(code, date_from, date_to)
+        else:
+            window = self.bars(code, interval, date_from, date_to)
+        dates = window['Date'].astype('datetime64[D]')
+        data = {'Date': dates.astype('datetime64[s]') if parse_dates else np.datetime_as_string(dates)}
+        for column in columns:
+            data[column] = window[column]
+        return pd.DataFrame(data)
+
+    def invalidate(self, code: Optional[str] = None) -> None:
+        """
+        Drops one symbol, or every symbol when code is None.
+        """
+        with self._lock:
+            codes = list(self._entries) if code is None else [code]
+            for name in codes:
+                history = self._entries.pop(name, None)
+                if history is not None:
+                    self.nbytes -= history.nbytes
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'size': len(self._entries), 'bytes': self.nbytes, 'budget': self.budget}
+
+
+_lock = threading.Lock()
+_stores: Dict[str, PriceStore] = {}
+
+
+def shared(db_path: str, snapshot_dir: Optional[str] = None, budget: int = 64 * 2 ** 20,
+           query: Optional[Query] = None) -> PriceStore:
+    """
+    Returns the store of the database for the whole process, created on first use.
+
+    :param db_path: The scraper's database.
+    :param snapshot_dir: The directory the scraper exports its snapshot to.
+    :param budget: Bytes of arrays kept, only used when the store is created.
+    :param query: Runs the store's queries, only used when the store is created.
+    :return: The shared store.
+    """
+    db_path = str(db_path)
+    with _lock:
+        store = _stores.get(db_path)
+        if store is None:
+            store = PriceStore(db_path, snapshot_dir, budget, query)
+            _stores[db_path] = store
+    return store
@@ -1,8 +1,15 @@
+import numpy as np
 import pandas as pd
 import ta
 from datetime import datetime, timedelta
 from typing import Optional
 
+try:
+    from .indicator_registry import registry
+except ImportError:
+    # imported as a top level module, with this directory on sys.path
+    from indicator_registry import registry
+
 class IndicatorStrategy:
     def calculate(self, df: pd.DataFrame) -> Optional[float]:
         """
@@ -83,7 +90,13 @@ class WMA(IndicatorStrategy):
         indicator = ta.trend.WMAIndicator(close=df['Last_trade_price'], fillna=True)
         return round(indicator.wma().iloc[-1], 2)
 
-def calc_indicators(data: pd.DataFrame):
+def strategy_indicators(data: pd.DataFrame):
+    """
+    Calculates the indicators one ta strategy at a time, each over its own pandas Series.
+
+    :param data: DataFrame with Last_trade_price, Max and Min columns in ascending date order.
+    :return: {'Oscillators': {...}, 'Moving averages': {...}} like calc_indicators.
+    """
     strategies = {
         'Relative Strength Index': RSI(),
         'Stochastic RSI %D': StochasticRSI(),
@@ -97,81 +110,66 @@ def calc_indicators(data: pd.DataFrame):
         'Weighted Moving Average': WMA()
     }
 
-    oscillators = {key: strategy.calculate(data) for key, strategy in strategies.items() if key in [
-        'Relative Strength Index', 'Stochastic RSI %D', 'Commodity Channel Index', 'Trix', 'Awesome Oscillator']}
-
-    moving_averages = {key: strategy.calculate(data) for key, strategy in strategies.items() if key in [
-        'Simple Moving Average', 'Exponential Moving Average', 'Ichimoku',
-        'Kaufman’s Adaptive Moving Average', 'Weighted Moving Average']}
-
-    return {'Oscillators': oscillators, 'Moving averages': moving_averages}
+    # an indicator registered without a ta strategy has no value here
+    return {group: {key: strategies[key].calculate(data) if key in strategies else None for key in keys}
+            for group, keys in registry.groups().items()}
+
+def calc_indicators(data: pd.DataFrame, series: bool = False):
+    """
+    Calculates the registered indicators over shared NumPy arrays with indicator_registry, every
+    intermediate result once. The values match the ta strategies, rows with a missing price still go
+    through strategy_indicators.
+
+    :param data: DataFrame with Last_trade_price, Max and Min columns in ascending date order, or a dict of
+                 such arrays like a PriceStore window, which is used without copying.
+    :param series: Also return the full series of every indicator under 'Series', aligned with the rows.
+    :return: {'Oscillators': {...}, 'Moving averages': {...}} with the latest values, None where there
+             is not enough data.
+    """
+    close = np.asarray(data['Last_trade_price'], dtype=np.float64)
+    high = np.asarray(data['Max'], dtype=np.float64)
+    low = np.asarray(data['Min'], dtype=np.float64)
+    if np.isfinite(close).all() and np.isfinite(high).all() and np.isfinite(low).all():
+        return registry.calc_indicators(close, high, low, series)
+    result = strategy_indicators(pd.DataFrame({'Last_trade_price': close, 'Max': high, 'Min': low}))
+    if series:
+        result['Series'] = {key: None for group in result.values() for key in group}
+    return result
+
+# how far back each time period reaches from today
+PERIOD_LENGTHS = {'5 years': timedelta(days=5 * 365), '1 year': timedelta(days=365), '1 month': timedelta(days=30), '1 week': timedelta(weeks=1), '1 day': timedelta(days=1)}
+# the time periods the indicators can be computed over
+TIME_PERIODS = ['All time'] + list(PERIOD_LENGTHS)
+
+def period_start(timePeriod: str) -> Optional[str]:
+    """
+    :return: The first YYYY-MM-DD date of the given time period, None for 'All time' or an unknown period.
+    """
+    if timePeriod not in PERIOD_LENGTHS:
+        return None
+    return (datetime.now() - PERIOD_LENGTHS[timePeriod]).strftime('%Y-%m-%d')
 
 def filter_data(df: pd.DataFrame, timePeriod: str) -> pd.DataFrame:
-    possible_time_periods = ['All time', '5 years', '1 year', '1 month', '1 week', '1 day']
-    if timePeriod not in possible_time_periods or timePeriod == 'All time':
+    """
+    Keeps the rows of the given time period. The data is expected in ascending date order with
+    dates either as YYYY-MM-DD strings or datetimes, the first row of the period is found by binary
+    search and the rows from it on are returned as a slice.
+    """
+    date_cutoff = period_start(timePeriod)
+    if date_cutoff is None:
         return df
-
-    df = df.copy()
-    df = df.iloc[::-1].reset_index(drop=True)
-    original_date_format = '%d.%m.%Y'
-    df['Date'] = pd.to_datetime(df['Date'], format=original_date_format)
-    now = datetime.now()
-    cutoff_mapping = {'5 years': timedelta(days=5 * 365), '1 year': timedelta(days=365), '1 month': timedelta(days=30), '1 week': timedelta(weeks=1), '1 day': timedelta(days=1)}
-    date_cutoff = now - cutoff_mapping[timePeriod]
-    filtered_df = df[df['Date'] >= date_cutoff].copy()
-    filtered_df['Date'] = filtered_df['Date'].dt.strftime(original_date_format)
-    return filtered_df
+    if pd.api.types.is_datetime64_any_dtype(df['Date']):
+        date_cutoff = pd.Timestamp(date_cutoff)
+    return df.iloc[int(df['Date'].searchsorted(date_cutoff)):]
 
 def get_action(key: str, value: Optional[float], data: pd.DataFrame) -> str:
+    """
+    :return: 'Buy', 'Sell' or 'Hold' by the action the indicator is registered with, comparing moving
+             averages with the latest Last_trade_price of data.
+    """
     if value is None:
         return 'Hold'
-
-    if key == 'Relative Strength Index':
-        if value > 70:
-            return 'Sell'
-        elif value < 30:
-            return 'Buy'
-        return 'Hold'
-
-    elif key == 'Stochastic RSI %D':
-        if value > 80:
-            return 'Sell'
-        elif value < 20:
-            return 'Buy'
-        return 'Hold'
-
-    elif key == 'Commodity Channel Index':
-        if value > 100:
-            return 'Sell'
-        elif value < -100:
-            return 'Buy'
-        return 'Hold'
-
-    elif key == 'Trix':
-        if value > 0:
-            return 'Buy'
-        elif value < 0:
-            return 'Sell'
-        return 'Hold'
-
-    elif key == 'Awesome Oscillator':
-        if value > 0:
-            return 'Buy'
-        elif value < 0:
-            return 'Sell'
-        return 'Hold'
-
-    elif key in ['Simple Moving Average', 'Exponential Moving Average',
-                 'Kaufman’s Adaptive Moving Average', 'Weighted Moving Average',
-                 'Ichimoku']:
-        current_price = data['Last_trade_price'].iloc[-1]
-        if current_price > value:
-            return 'Buy'
-        elif current_price < value:
-            return 'Sell'
-        return 'Hold'
-
-    return 'Hold'
+    return registry.action(key, value, float(np.asarray(data['Last_trade_price'])[-1]))
 
 def print_results(indicators, data):
     result_parts = []
@@ -0,0 +1,39 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import downsampling
+
+
+class LttbTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.x = np.arange(1000, dtype=np.int64) + 19000
+        self.y = np.cumsum(rng.normal(size=1000))
+
+    def test_keeps_first_and_last_points(self):
+        indices = downsampling.lttb(self.x, self.y, 50)
+        self.assertEqual(indices[0], 0)
+        self.assertEqual(indices[-1], len(self.y) - 1)
+
+    def test_returns_as_many_ascending_points_as_asked(self):
+        for points in (3, 10, 50, 999):
+            indices = downsampling.lttb(self.x, self.y, points)
+            self.assertEqual(len(indices), points)
+            self.assertTrue(np.all(np.diff(indices) > 0))
+
+    def test_short_series_is_returned_unchanged(self):
+        for points in (len(self.y), len(self.y) + 1):
+            np.testing.assert_array_equal(downsampling.lttb(self.x, self.y, points), np.arange(len(self.y)))
+
+    def test_keeps_a_spike(self):
+        y = np.zeros(1000)
+        y[500] = 100.0
+        self.assertIn(500, downsampling.lttb(self.x, y, 20))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import indicator_state
+import price_store
+import technical_analysis
+
+
+class IndicatorStateParityTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.directory.name, 'database.sqlite')
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute(f"CREATE TABLE \"ALK\" (Date TEXT, {', '.join(f'{c} REAL' for c in price_store.COLUMNS)})")
+        self.states = indicator_state.StateStore(os.path.join(self.directory.name, 'state.sqlite'))
+        self.days = iter(np.arange(np.datetime64('2020-01-01'), np.datetime64('2030-01-01')))
+        self.random = np.random.default_rng(7)
+        self.close = 1000.0
+
+    def tearDown(self):
+        self.conn.close()
+        self.directory.cleanup()
+
+    # appends a random walk of that many trading days
+    def append(self, count):
+        for _ in range(count):
+            self.close *= 1 + self.random.normal(0, 0.02)
+            self.insert(str(next(self.days)), self.close)
+
+    def insert(self, date, close):
+        spread = abs(self.random.normal(0, 0.01)) * close
+        self.conn.execute("INSERT INTO \"ALK\" (Date, Last_trade_price, Max, Min, Volume, Total_turnover_in_denars) "
+                          "VALUES (?, ?, ?, ?, 1, ?)", (date, close, close + spread, close - spread, close))
+        self.conn.commit()
+
+    def engine(self):
+        return technical_analysis.calc_indicators(price_store.PriceStore(self.db_path).window('ALK'))
+
+    def state(self):
+        return indicator_state.catch_up(self.states, 'ALK', self.conn)
+
+    def assertMatchesEngine(self, state):
+        engine = self.engine()
+        for group, values in engine.items():
+            for name, value in values.items():
+                self.assertAlmostEqual(state.values()[group][name], value, delta=0.011, msg=name)
+
+    def test_full_history(self):
+        self.append(300)
+        self.assertMatchesEngine(self.state())
+
+    def test_incremental_matches_full_history(self):
+        self.append(200)
+        self.state()
+        self.append(1)
+        self.state()
+        self.append(100)
+        state = self.state()
+        self.assertEqual(state.rows, 301)
+        self.assertMatchesEngine(state)
+
+    def test_date_stored_twice_counts_once(self):
+        self.append(200)
+        last = self.conn.execute("SELECT MAX(Date) FROM \"ALK\"").fetchone()[0]
+        self.insert(last, self.close * 1.05)
+        state = self.state()
+        self.assertEqual(state.rows, 200)
+        self.assertMatchesEngine(state)
+        self.append(50)
+        state = self.state()
+        self.assertEqual(state.rows, 250)
+        self.assertMatchesEngine(state)
+
+    def test_last_day_saved_again(self):
+        self.append(200)
+        self.state()
+        self.conn.execute("UPDATE \"ALK\" SET Last_trade_price = Last_trade_price * 1.1 "
+                          "WHERE Date = (SELECT MAX(Date) FROM \"ALK\")")
+        self.conn.commit()
+        self.assertMatchesEngine(self.state())
+
+    def test_backfilled_day(self):
+        self.append(200)
+        self.state()
+        self.insert('2019-12-31', self.close)
+        state = self.state()
+        self.assertEqual(state.rows, 201)
+        self.assertMatchesEngine(state)
+
+
+if __name__ == '__main__':
+    unittest.main()
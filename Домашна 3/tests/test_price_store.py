@@ -0,0 +1,97 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import price_store
+
+
+class PriceStoreRefreshTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.directory.name, 'database.sqlite')
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute(f"CREATE TABLE \"ALK\" (Date TEXT, {', '.join(f'{c} REAL' for c in price_store.COLUMNS)})")
+        self.queries = []
+        self.store = price_store.PriceStore(self.db_path, query=self.query)
+
+    def tearDown(self):
+        self.conn.close()
+        self.directory.cleanup()
+
+    def query(self, sql, params=()):
+        self.queries.append(sql)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.execute(sql, params)
+            return [description[0] for description in cursor.description], cursor.fetchall()
+        finally:
+            conn.close()
+
+    def insert(self, date, price):
+        self.conn.execute(f"INSERT INTO \"ALK\" VALUES (?{', ?' * len(price_store.COLUMNS)})",
+                          (date,) + (price,) * len(price_store.COLUMNS))
+        self.conn.commit()
+
+    def prices(self):
+        return self.store.window('ALK')['Last_trade_price'].tolist()
+
+    def test_appended_rows(self):
+        self.insert('2024-01-01', 1.0)
+        self.assertEqual(self.prices(), [1.0])
+        self.insert('2024-01-02', 2.0)
+        self.assertEqual(self.prices(), [1.0, 2.0])
+
+    def test_last_day_saved_again(self):
+        self.insert('2024-01-01', 1.0)
+        self.insert('2024-01-02', 2.0)
+        self.assertEqual(self.prices(), [1.0, 2.0])
+        self.conn.execute("UPDATE \"ALK\" SET Last_trade_price = 5 WHERE Date = '2024-01-02'")
+        self.insert('2024-01-03', 3.0)
+        self.assertEqual(self.prices(), [1.0, 5.0, 3.0])
+
+    def test_last_day_stored_twice_keeps_last_row(self):
+        self.insert('2024-01-01', 1.0)
+        self.assertEqual(self.prices(), [1.0])
+        self.insert('2024-01-01', 4.0)
+        self.assertEqual(self.prices(), [4.0])
+
+    def test_removed_rows_reload(self):
+        self.insert('2024-01-01', 1.0)
+        self.insert('2024-01-02', 2.0)
+        self.assertEqual(self.prices(), [1.0, 2.0])
+        self.conn.execute("DELETE FROM \"ALK\" WHERE Date = '2024-01-01'")
+        self.insert('2024-01-03', 3.0)
+        self.assertEqual(self.prices(), [2.0, 3.0])
+        self.assertEqual(self.store.window('ALK')['Date'].tolist(), [19724, 19725])
+
+    def test_reads_go_through_query(self):
+        self.insert('2024-01-01', 1.0)
+        self.prices()
+        self.assertEqual(len(self.queries), 1)
+        self.prices()
+        self.assertEqual(len(self.queries), 1)
+
+    def test_stored_bars(self):
+        self.conn.execute("CREATE TABLE bars (Code TEXT, Interval TEXT, Start TEXT, End TEXT, Open REAL, High REAL, "
+                          "Low REAL, Close REAL, Volume REAL, Turnover REAL, Days INTEGER)")
+        self.conn.execute("INSERT INTO bars VALUES ('ALK', 'week', '2024-01-01', '2024-01-02', 1, 3, 1, 2, 20, 30, 2)")
+        self.insert('2024-01-01', 1.0)
+        self.insert('2024-01-02', 2.0)
+        bars = self.store.bars('ALK', 'week')
+        self.assertEqual(bars['Date'].tolist(), [19723])
+        self.assertEqual(bars['Last_trade_price'].tolist(), [2.0])
+        self.assertEqual(bars['Days'].tolist(), [2])
+        self.assertIn('week', self.store.history('ALK').bars)
+        self.assertEqual(len(self.store.bars('ALK', 'week', '2024-01-03')['Date']), 0)
+
+    def test_no_bars_table(self):
+        self.insert('2024-01-01', 1.0)
+        with self.assertRaises(ValueError):
+            self.store.bars('ALK', 'week')
+
+
+if __name__ == '__main__':
+    unittest.main()